@@ -0,0 +1,370 @@
+import argparse
+import asyncio
+import csv
+import itertools
+import json
+import re
+import sys
+from pathlib import Path
+from typing import AsyncIterable, AsyncIterator, Callable, Iterable, get_args
+
+import columnar
+import pandas as pd
+import rate_limit
+from graph import ainvoke_graph
+from models import LocationDetails, OutputState, PipelineMode, PropertyFeatures, UserInput
+from rendering import RenderTarget, StreamingWriter, render
+
+DEFAULT_CONCURRENCY = 8
+COLUMNAR_CHUNK_SIZE = 10_000
+
+
+def parse_listing(item: dict | UserInput | Exception) -> UserInput:
+    """Validate a listing given either in the API shape or the `UserInput.from_dict` shape.
+
+    Listings already validated by `read_columnar` are passed through, or their error raised.
+    """
+    if isinstance(item, UserInput):
+        return item
+    if isinstance(item, Exception):
+        raise item
+    if not isinstance(item, dict):
+        raise ValueError("Not a JSON object")
+    if "location" in item or "features" in item:
+        return UserInput.from_dict(dict(item))
+    return UserInput(**item)
+
+
+def result_record(
+    index: int, result: OutputState | Exception, user_input: UserInput | None = None
+) -> dict:
+    if isinstance(result, Exception):
+        return {"index": index, "error": f"{type(result).__name__}: {result}"}
+    return {"index": index, "output": result.model_dump(), "html": result.to_html(user_input)}
+
+
+async def _aiter(items: Iterable[dict]) -> AsyncIterator[dict]:
+    for item in items:
+        yield item
+
+
+async def run_batch(
+    items: AsyncIterable[dict] | Iterable[dict],
+    concurrency: int = DEFAULT_CONCURRENCY,
+    bypass_cache: bool = False,
+    mode: PipelineMode = "graph",
+) -> AsyncIterator[tuple[int, UserInput | None, OutputState | Exception]]:
+    """Generate listings for `items`, yielding `(index, user_input, result)` in completion
+    order; `user_input` is None for items that failed validation.
+
+    At most `concurrency` graphs run at once and input is only read as slots free up, so
+    arbitrarily long streams are never buffered. Identical listings that are in flight at the
+    same time share one graph run, and sub-work shared across listings (e.g. the same
+    neighborhood) is served by the LLM cache.
+    """
+    if not isinstance(items, AsyncIterable):
+        items = _aiter(items)
+
+    pending: set[asyncio.Task] = set()
+
+    async def validated(
+        index: int, item: dict
+    ) -> tuple[int, UserInput | None, OutputState | Exception]:
+        try:
+            user_input = parse_listing(item)
+        except (ValueError, TypeError, KeyError) as error:
+            return index, None, error
+        try:
+            return index, user_input, await ainvoke_graph(user_input, bypass_cache, mode)
+        except Exception as error:
+            return index, user_input, error
+
+    index = 0
+    try:
+        async for item in items:
+            while len(pending) >= concurrency:
+                done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    pending.remove(task)
+                    yield task.result()
+            pending.add(asyncio.create_task(validated(index, item)))
+            index += 1
+
+        for task in asyncio.as_completed(pending):
+            yield await task
+    finally:
+        # Reached early when the consumer stops (e.g. the client disconnected).
+        for task in pending:
+            task.cancel()
+
+
+def parse_ndjson(lines: Iterable[str | bytes]) -> Iterable[dict | ValueError]:
+    """Parse NDJSON lazily; a line that is not valid JSON is yielded as its error, so that
+    only that listing fails.
+    """
+    for number, line in enumerate(lines, start=1):
+        if line.strip():
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError as error:
+                yield ValueError(f"Line {number} is not valid JSON: {error}")
+
+
+def read_listings(file) -> Iterable[dict | ValueError]:
+    """Read a JSON array or NDJSON stream of listings; NDJSON is read lazily line by line."""
+    first_line = file.readline()
+    if first_line.lstrip().startswith("["):
+        yield from json.loads(first_line + file.read())
+        return
+    yield from parse_ndjson(itertools.chain([first_line], file))
+
+
+def csv_row_to_listing(row: dict) -> dict:
+    """Map a flat CSV row (city, neighborhood, bedrooms, ... columns) to the from_dict shape."""
+    values = {column: value for column, value in row.items() if value not in ("", None)}
+    listing = {
+        column: value
+        for column, value in values.items()
+        if column not in LocationDetails.model_fields and column not in PropertyFeatures.model_fields
+    }
+    listing["location"] = {
+        column: values[column] for column in LocationDetails.model_fields if column in values
+    }
+    listing["features"] = {
+        column: values[column] for column in PropertyFeatures.model_fields if column in values
+    }
+    return listing
+
+
+def read_rows(file, input_format: str) -> Iterable[tuple[str, dict | ValueError]]:
+    """Yield `(listing_id, listing)` pairs; the id is the "id" field or the row number."""
+    rows = csv.DictReader(file) if input_format == "csv" else read_listings(file)
+    for position, row in enumerate(rows, start=1):
+        listing = csv_row_to_listing(row) if input_format == "csv" else row
+        listing_id = listing.pop("id", None) if isinstance(listing, dict) else None
+        yield str(listing_id or position), listing
+
+
+def _json_chunks(
+    file, chunk_size: int
+) -> Iterable[tuple[pd.DataFrame, dict[int, ValueError], Callable[[int], dict]]]:
+    # Each chunk's frame is indexed by position in the chunk; the positions of items that
+    # are not listings come with their error instead.
+    listings = read_listings(file)
+    for chunk in iter(lambda: list(itertools.islice(listings, chunk_size)), []):
+        readable = [position for position, item in enumerate(chunk) if isinstance(item, dict)]
+        unreadable = {
+            position: item if isinstance(item, ValueError) else ValueError("Not a JSON object")
+            for position, item in enumerate(chunk)
+            if not isinstance(item, dict)
+        }
+        frame = columnar.listings_frame(chunk[position] for position in readable)
+        frame.index = pd.Index(readable)
+        yield frame, unreadable, chunk.__getitem__
+
+
+def _csv_chunks(
+    file, chunk_size: int
+) -> Iterable[tuple[pd.DataFrame, dict[int, ValueError], Callable[[int], dict]]]:
+    # As `_json_chunks`. Only empty cells are missing values, as in `csv_row_to_listing`.
+    frames = pd.read_csv(
+        file, dtype=str, keep_default_na=False, na_values=[""], chunksize=chunk_size
+    )
+    for frame in frames:
+        frame = frame.set_axis(pd.RangeIndex(len(frame)))
+        yield frame, {}, lambda position: csv_row_to_listing(frame.loc[position].dropna().to_dict())
+
+
+def _parse_or_error(listing: dict) -> UserInput | Exception:
+    # As in `read_rows`, the id is not part of the listing.
+    try:
+        return parse_listing({key: value for key, value in listing.items() if key != "id"})
+    except (ValueError, TypeError, KeyError) as error:
+        return error
+
+
+def read_columnar(
+    file, input_format: str, chunk_size: int = COLUMNAR_CHUNK_SIZE
+) -> Iterable[tuple[str, UserInput | Exception]]:
+    """Like `read_rows`, but validates `chunk_size` listings at a time with columnar.py and
+    yields each as a `PreparedUserInput` or its validation error.
+    """
+    if input_format == "csv":
+        chunks = _csv_chunks(file, chunk_size)
+    else:
+        chunks = _json_chunks(file, chunk_size)
+    row_number = 0
+    for frame, unreadable, listing_at in chunks:
+        ids = frame.pop("id").to_dict() if "id" in frame else {}
+        listings = dict(zip(frame.index, columnar.prepare(frame)))
+        # Invalid listings are validated again one at a time, so that their errors read
+        # exactly as without columnar validation.
+        for position, listing in listings.items():
+            if isinstance(listing, ValueError):
+                listings[position] = _parse_or_error(listing_at(position))
+        listings.update(unreadable)
+        for position in range(len(listings)):
+            row_number += 1
+            listing_id = ids.get(position)
+            if listing_id is None or pd.isna(listing_id) or not listing_id:
+                listing_id = row_number
+            yield str(listing_id), listings[position]
+
+
+def load_checkpoint(path: str) -> set[str]:
+    if not Path(path).exists():
+        return set()
+    with open(path) as file:
+        return {line.strip() for line in file if line.strip()}
+
+
+class ResultWriter:
+    """Writes each result as it arrives: as NDJSON records, as one rendered document
+    (`output_format` "page", "fragment" or "json_ld") streamed to `output`, or as one file per
+    listing in `output_dir`. Failures go to errors.ndjson in `output_dir`, or to stderr when
+    `output` is a rendered document.
+    """
+
+    def __init__(
+        self, output: str, output_dir: str | None, append: bool, output_format: str = "ndjson"
+    ):
+        self.output_dir = Path(output_dir) if output_dir else None
+        self.output_format = output_format
+        self._document = None
+        self._output = None
+        if self.output_dir:
+            self.output_dir.mkdir(parents=True, exist_ok=True)
+            self._records = open(self.output_dir / "errors.ndjson", "a" if append else "w")
+            return
+        self._output = sys.stdout if output == "-" else open(output, "a" if append else "w")
+        if output_format == "ndjson":
+            self._records = self._output
+        else:
+            self._records = sys.stderr
+            self._document = StreamingWriter(self._output, output_format)
+
+    def write(
+        self,
+        listing_id: str,
+        index: int,
+        result: OutputState | Exception,
+        user_input: UserInput | None = None,
+    ):
+        if not isinstance(result, Exception):
+            if self.output_dir:
+                target = "page" if self.output_format == "ndjson" else self.output_format
+                extension = ".json" if target == "json_ld" else ".html"
+                file_name = re.sub(r"[^\w.-]", "_", listing_id) + extension
+                (self.output_dir / file_name).write_text(render(result, target, user_input))
+                return
+            if self._document:
+                self._document.write(result, user_input)
+                return
+        record = {"id": listing_id, **result_record(index, result, user_input)}
+        self._records.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._records.flush()
+
+    def close(self):
+        if self._document:
+            self._document.close()
+        for file in {self._records, self._output}:
+            if file not in (None, sys.stdout, sys.stderr):
+                file.close()
+
+
+async def run_cli(args: argparse.Namespace):
+    rate_limit.configure_rate_limits(
+        rate_limit.parse_rate_limits(args.rate_limit),
+        rate_limit.parse_rate_limits(args.token_limit),
+    )
+    input_format = args.format or ("csv" if args.input.endswith(".csv") else "json")
+    completed = load_checkpoint(args.checkpoint) if args.checkpoint else set()
+    # Only the ids and input positions of listings that are currently in flight are kept in
+    # memory; records carry the input position, which stays the same when a run is resumed.
+    in_flight: dict[int, tuple[str, int]] = {}
+
+    def pending_listings(
+        rows: Iterable[tuple[str, dict | UserInput | Exception]],
+    ) -> Iterable[dict | UserInput | Exception]:
+        index = 0
+        for position, (listing_id, listing) in enumerate(rows):
+            if listing_id in completed:
+                continue
+            in_flight[index] = listing_id, position
+            index += 1
+            yield listing
+
+    # Building frames from NDJSON costs more than columnar validation saves (see
+    # `benchmark.py bulk`), so it is always read one listing at a time.
+    read = read_columnar if args.columnar and input_format == "csv" else read_rows
+    input_file = open(args.input, newline="") if args.input != "-" else sys.stdin
+    append = bool(completed)
+    if append and args.output_format != "ndjson" and not args.output_dir:
+        raise SystemExit("A rendered document cannot be resumed; use --output-dir instead.")
+    writer = ResultWriter(args.output, args.output_dir, append, args.output_format)
+    checkpoint = open(args.checkpoint, "a") if args.checkpoint else None
+    try:
+        async for index, user_input, result in run_batch(
+            pending_listings(read(input_file, input_format)),
+            args.concurrency,
+            args.bypass_cache,
+            args.mode,
+        ):
+            listing_id, position = in_flight.pop(index)
+            writer.write(listing_id, position, result, user_input)
+            # Failed listings are not checkpointed, so a resumed run retries them.
+            if checkpoint and not isinstance(result, Exception):
+                checkpoint.write(listing_id + "\n")
+                checkpoint.flush()
+    finally:
+        input_file.close()
+        writer.close()
+        if checkpoint:
+            checkpoint.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate listings for a batch of inputs")
+    parser.add_argument(
+        "input", nargs="?", default="-", help="CSV, JSON array or NDJSON file (default: stdin)"
+    )
+    parser.add_argument(
+        "--format", choices=["csv", "json"], help="Input format (default: from the file extension)"
+    )
+    parser.add_argument("-o", "--output", default="-", help="Output file (default: stdout)")
+    parser.add_argument(
+        "--output-dir", help="Write one file per listing here instead of NDJSON"
+    )
+    parser.add_argument(
+        "--output-format",
+        choices=["ndjson", *get_args(RenderTarget)],
+        default="ndjson",
+        help="NDJSON records, or listings rendered as full HTML pages, fragments or JSON-LD",
+    )
+    parser.add_argument(
+        "--checkpoint",
+        help="File recording completed listing ids; rerunning with it skips them",
+    )
+    parser.add_argument(
+        "--columnar",
+        action="store_true",
+        help="Validate and prepare CSV listings in columnar chunks (faster on large inputs)",
+    )
+    parser.add_argument("-c", "--concurrency", type=int, default=DEFAULT_CONCURRENCY)
+    parser.add_argument(
+        "--rate-limit",
+        default="",
+        help='Requests per minute per model, e.g. "gpt-4o=500,gpt-4o-mini=2000"',
+    )
+    parser.add_argument(
+        "--token-limit",
+        default="",
+        help='Tokens per minute per model, e.g. "gpt-4o=30000,gpt-4o-mini=200000"',
+    )
+    parser.add_argument("--bypass-cache", action="store_true")
+    parser.add_argument("--mode", choices=get_args(PipelineMode), default="graph")
+    asyncio.run(run_cli(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,668 @@
+import argparse
+import asyncio
+import csv
+import io
+import itertools
+import json
+import os
+import random
+import resource
+import statistics
+import sys
+import time
+import tracemalloc
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import get_args
+
+# The benchmarks never reach OpenAI, but the clients in graph.py need a key to be constructed.
+os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+
+import batch  # noqa: E402
+import graph  # noqa: E402
+import httpx  # noqa: E402
+import prompts  # noqa: E402
+from columnar import flatten_listing  # noqa: E402
+from fake_llm import FakeChatModel, LatencyDistribution  # noqa: E402
+from graph import build_graph_builder, get_graph  # noqa: E402
+from langchain_core.callbacks import get_usage_metadata_callback  # noqa: E402
+from langchain_core.prompts import ChatPromptTemplate  # noqa: E402
+from main import app  # noqa: E402
+from models import (  # noqa: E402
+    LocationDetails,
+    OutputState,
+    PipelineMode,
+    PropertyAdjectives,
+    PropertyFeatures,
+    UserInput,
+)
+from pricing import cost_usd  # noqa: E402
+from rendering import StreamingWriter, render_fragment, render_json_ld, render_page  # noqa: E402
+from tokens import count_tokens  # noqa: E402
+
+SAMPLE_INPUT = json.loads((Path(__file__).parents[2] / "input.json").read_text())
+
+
+def _per_request_seconds(setup, requests: int) -> float:
+    start = time.perf_counter()
+    for _ in range(requests):
+        setup()
+    return (time.perf_counter() - start) / requests
+
+
+def _rebuild_prompt_templates():
+    ChatPromptTemplate(
+        [
+            ("system", prompts.title_generator_system_prompt),
+            ("human", prompts.title_generator_user_prompt),
+        ]
+    ).format_messages(title="T2 flat", bedrooms=2, neighborhood="Alfama", city="Lisbon")
+
+
+def _reuse_prompt_templates():
+    prompts.title_generator_prompt_template.format_messages(
+        title="T2 flat", bedrooms=2, neighborhood="Alfama", city="Lisbon"
+    )
+
+
+def run_construction_benchmark(requests: int):
+    """Compare the per-request setup cost of rebuilding the graph and prompts against reusing them."""
+    get_graph()
+    results = {
+        "graph: build + compile per request": _per_request_seconds(
+            lambda: build_graph_builder().compile(), requests
+        ),
+        "graph: cached get_graph()": _per_request_seconds(get_graph, requests),
+        "prompt: rebuild template per call": _per_request_seconds(
+            _rebuild_prompt_templates, requests
+        ),
+        "prompt: reuse module template": _per_request_seconds(
+            _reuse_prompt_templates, requests
+        ),
+    }
+    for label, seconds in results.items():
+        ceiling = f"{1 / seconds:,.0f} req/s" if seconds else "unbounded"
+        print(f"{label:<40} {seconds * 1000:9.4f} ms/request  (ceiling {ceiling})")
+
+
+def legacy_to_html(listing: OutputState) -> str:
+    """The string-concatenation renderer that OutputState.to_html used to be, for comparison."""
+    key_features_html = (
+        "<ul id=\"key-features\">\n  "
+        + "\n  ".join([f"<li>{feature}</li>" for feature in listing.key_features_list])
+        + "\n</ul>"
+    )
+    return (
+        ""
+        + f"<title>{listing.title}</title>\n"
+        + f"<meta name=\"description\" content=\"{listing.meta_description}\"\n"
+        + f"<h1>{listing.headline}</h1>\n"
+        + f"<section_id=\"description\">\n  <p>\n{listing.full_description}\n  </p>\n</section>\n"
+        + key_features_html
+        + f"<section id=\"neighborhood\">\n  <p>\n  {listing.neighborhood_summary}\n  </p>\n</section>\n"
+        + f"<p class=\"call-to-action\">{listing.call_to_action}</p>"
+    )
+
+
+def run_render_benchmark(listings: int):
+    """Time each renderer over `listings` listings with realistic section lengths, where every
+    sentence has characters to escape (the worst case for the new renderers)."""
+    user_input = UserInput(**SAMPLE_INPUT)
+    listing = OutputState(
+        title="4BR House in Achrafieh, Beirut",
+        meta_description="4BR House for sale in Achrafieh, Beirut – €165,000. 130 sqm & parking.",
+        headline="4BR House in Achrafieh, Beirut with 130 sqm and parking",
+        full_description="A bright family home with \"character\" & <room> to grow. " * 20,
+        key_features_list=user_input.key_features_list,
+        neighborhood_summary="Leafy streets, cafés & galleries close to downtown. " * 8,
+        call_to_action=user_input.call_to_action(),
+    )
+
+    def stream(target):
+        writer = StreamingWriter(io.StringIO(), target)
+        for _ in range(listings):
+            writer.write(listing, user_input)
+        writer.close()
+
+    results = {
+        "legacy to_html (unescaped)": lambda: [legacy_to_html(listing) for _ in range(listings)],
+        "page": lambda: [render_page(listing, user_input) for _ in range(listings)],
+        "fragment": lambda: [render_fragment(listing) for _ in range(listings)],
+        "json_ld": lambda: [render_json_ld(listing, user_input) for _ in range(listings)],
+        "streaming page writer": lambda: stream("page"),
+        "streaming json_ld writer": lambda: stream("json_ld"),
+    }
+    for label, run in results.items():
+        start = time.perf_counter()
+        run()
+        seconds = time.perf_counter() - start
+        print(f"{label:<30} {seconds / listings * 1e6:8.2f} us/listing  ({listings / seconds:,.0f} listings/s)")
+
+
+# Phrases as the adjective generator tends to return them, with the overlaps it produces.
+ADJECTIVE_VOCABULARY = {
+    "area_size": ["spacious", "spacious and bright", "bright and airy", "generous", "cozy", "open-plan", "light-filled"],
+    "year_built": ["modern", "modern and stylish", "recently renovated", "charming", "classic", "well-maintained"],
+    "ideal_occupants": ["perfect for families", "ideal for families", "perfect for young families", "great for professionals", "ideal for couples"],
+    "amenities": ["convenient parking", "private parking", "modern elevator", "elevator access", "spacious balcony"],
+}
+SUMMARY_SENTENCES = [
+    "The neighborhood is known for its leafy streets and relaxed, village-like atmosphere.",
+    "Independent cafés, bakeries and restaurants line the main avenues, and a weekly market brings in fresh local produce.",
+    "Families appreciate the well-regarded schools, playgrounds and the large park at its heart.",
+    "Public transport is excellent, with metro and bus connections reaching the city center in about fifteen minutes.",
+    "In the evenings the squares fill with residents enjoying terraces and the lively cultural scene.",
+    "Galleries, a theater and a historic library give the area a strong cultural identity.",
+    "Despite its central location, the residential streets remain quiet and safe.",
+    "Supermarkets, pharmacies and gyms are all within walking distance.",
+]
+DESCRIPTION_SENTENCES = [
+    "Welcome to this beautifully presented home, where thoughtful design meets everyday comfort.",
+    "The generous living room is bathed in natural light and flows into a modern, fully equipped kitchen.",
+    "Each bedroom offers a calm retreat with ample storage, while the bathrooms feature contemporary finishes.",
+    "Large windows frame views over the surrounding streets and fill the space with light throughout the day.",
+    "The layout works equally well for family life, entertaining friends or working from home.",
+    "Quality materials and careful maintenance mean you can move in without lifting a finger.",
+    "Step outside and you are moments from cafés, shops and green spaces that make the area so sought after.",
+    "Excellent transport links put the rest of the city within easy reach.",
+    "This is a rare opportunity to secure a home that combines character, comfort and location.",
+    "Arrange a visit to experience the atmosphere of the property for yourself.",
+]
+
+
+def legacy_full_description_user_prompt(state: dict) -> str:
+    """The user prompt that both the full and the meta description were built from before
+    prompt budgets, kept for comparison.
+    """
+    user_prompt = state["user_input"].build_features_paragraph()
+    adjectives_list = state["adjectives"].all_adjectives_list
+    if adjectives_list:
+        user_prompt += "Here's a list of adjectives/phrases you can use to populate your description:\n- "
+        user_prompt += "\n- ".join(adjectives_list)
+    user_prompt += f"\nAnd here is a summary for the neighborhood: {state['neighborhood_summary']}"
+    return user_prompt
+
+
+def _prompt_tokens(template: ChatPromptTemplate, **variables) -> int:
+    return sum(
+        count_tokens(str(message.content)) for message in template.format_messages(**variables)
+    )
+
+
+def prompt_benchmark_corpus(listings: int, seed: int = 0) -> list[dict]:
+    """Graph states as the prompt builders see them, with adjectives, summaries and
+    descriptions of realistic length.
+    """
+    rng = random.Random(seed)
+    states = []
+    for listing in sample_listings(listings):
+        adjectives = PropertyAdjectives(
+            **{
+                category: rng.sample(vocabulary, rng.randint(2, 3))
+                for category, vocabulary in ADJECTIVE_VOCABULARY.items()
+            }
+        )
+        states.append(
+            {
+                "user_input": UserInput(**listing),
+                "adjectives": adjectives,
+                "title": "3BR Apartment in Achrafieh, Beirut",
+                "neighborhood_summary": " ".join(rng.sample(SUMMARY_SENTENCES, rng.randint(4, 8))),
+                "full_description": " ".join(rng.sample(DESCRIPTION_SENTENCES, rng.randint(7, 10))),
+            }
+        )
+    return states
+
+
+def run_prompt_benchmark(listings: int):
+    """Prompt tokens per listing for the nodes that take generated text as input, before and
+    after prompt budgets.
+    """
+    nodes = {
+        "generate_full_description": (
+            lambda state: _prompt_tokens(
+                prompts.full_description_prompt_template,
+                description_input=legacy_full_description_user_prompt(state),
+            ),
+            lambda state: _prompt_tokens(
+                prompts.full_description_prompt_template,
+                description_input=prompts.full_description_user_prompt(state),
+            ),
+        ),
+        "generate_meta_description": (
+            lambda state: _prompt_tokens(
+                prompts.meta_description_prompt_template,
+                description_input=legacy_full_description_user_prompt(state),
+            ),
+            lambda state: _prompt_tokens(
+                prompts.meta_description_prompt_template,
+                description_input=prompts.meta_description_user_prompt(state),
+            ),
+        ),
+        "generate_headline": (
+            lambda state: _prompt_tokens(
+                prompts.headline_prompt_template,
+                title=state["title"],
+                features=state["adjectives"].all_adjectives_list,
+            ),
+            lambda state: _prompt_tokens(
+                prompts.headline_prompt_template,
+                title=state["title"],
+                features=prompts.headline_features(state),
+            ),
+        ),
+    }
+    corpus = prompt_benchmark_corpus(listings)
+    saved_per_listing = [0] * listings
+    print(f"{'node':<28} {'before':>8} {'after':>8} {'saved':>8}  (mean prompt tokens per listing)")
+    totals = [0, 0]
+    for node, (before, after) in nodes.items():
+        counts = [(before(state), after(state)) for state in corpus]
+        for index, (old, new) in enumerate(counts):
+            saved_per_listing[index] += old - new
+        mean_before = statistics.mean(old for old, _ in counts)
+        mean_after = statistics.mean(new for _, new in counts)
+        totals[0] += mean_before
+        totals[1] += mean_after
+        print(f"{node:<28} {mean_before:8.0f} {mean_after:8.0f} {mean_before - mean_after:8.0f}")
+    print(
+        f"{'total':<28} {totals[0]:8.0f} {totals[1]:8.0f} {totals[0] - totals[1]:8.0f}"
+        f"  ({(totals[0] - totals[1]) / totals[0]:.0%} saved, p5-p95 "
+        f"{percentile(saved_per_listing, 5):.0f}-{percentile(saved_per_listing, 95):.0f} per listing)"
+    )
+
+
+def bulk_corpus(rows: int, seed: int = 0) -> list[dict]:
+    """Listings with every optional feature present or missing at random, in both languages."""
+    rng = random.Random(seed)
+    listings = []
+    for _ in range(rows):
+        features = {
+            "bedrooms": rng.randint(0, 5),
+            "bathrooms": rng.randint(0, 3),
+            "area_sqm": rng.randint(25, 300),
+            "balcony": rng.random() < 0.5,
+            "parking": rng.random() < 0.5,
+            "elevator": rng.random() < 0.5,
+            "floor": rng.randint(0, 12),
+            "year_built": rng.randint(1900, 2025),
+        }
+        listings.append(
+            {
+                "title": rng.choice(["T2 apartment", "Family house", "Studio", "Sea view villa"]),
+                "location_details": {
+                    "city": rng.choice(["lisbon", "porto", "beirut", "madrid"]),
+                    "neighborhood": rng.choice(
+                        ["alfama", "campo de ourique", "achrafieh", "salamanca"]
+                    ),
+                },
+                "property_features": {
+                    name: value for name, value in features.items() if rng.random() < 0.8
+                },
+                "price": rng.randint(500, 2_000_000),
+                "listing_type": rng.choice(["sale", "rent"]),
+                "language": rng.choice(["en", "pt"]),
+            }
+        )
+    return listings
+
+
+# Values that columnar.py must accept or reject exactly as UserInput does.
+BULK_EDGE_VALUES = {
+    "price": [" 12 ", "1_000", "12.0", "12.5", "1e3", True, 99999999999999999999, None],
+    "bedrooms": ["2", 2.0, 2.5, str(2**53 + 1), "", None],
+    "balcony": ["YES", " yes", 1.0, 2, "1.0"],
+    "city": [5, "", "campo de ourique", "d'Oeste"],
+    "neighborhood": [None, 7],
+    "language": [None, "EN", "pt"],
+}
+
+
+def bulk_edge_cases() -> list[dict]:
+    """Variations of one listing, each with a field set to one of `BULK_EDGE_VALUES`."""
+    listings = []
+    for field, values in BULK_EDGE_VALUES.items():
+        for value in values:
+            listing = json.loads(json.dumps(bulk_corpus(1)[0]))
+            if field in LocationDetails.model_fields:
+                listing["location_details"][field] = value
+            elif field in PropertyFeatures.model_fields:
+                listing["property_features"][field] = value
+            else:
+                listing[field] = value
+            listings.append(listing)
+    return listings
+
+
+def bulk_inputs(listings: list[dict]) -> dict[str, str]:
+    """`listings` as CSV and as NDJSON."""
+    csv_file = io.StringIO()
+    columns = [
+        "title",
+        *LocationDetails.model_fields,
+        *PropertyFeatures.model_fields,
+        "price",
+        "listing_type",
+        "language",
+    ]
+    writer = csv.DictWriter(csv_file, fieldnames=columns)
+    writer.writeheader()
+    writer.writerows(flatten_listing(listing) for listing in listings)
+    return {
+        "csv": csv_file.getvalue(),
+        "json": "\n".join(json.dumps(listing) for listing in listings),
+    }
+
+
+def bulk_mismatches(text: str, input_format: str) -> int:
+    """How many listings of `text` the per-object and columnar paths read differently."""
+
+    def outcome(listing) -> tuple:
+        try:
+            user_input = batch.parse_listing(listing)
+        except (ValueError, TypeError, KeyError) as error:
+            return (batch.result_record(0, error),)
+        return (
+            user_input.model_dump(),
+            user_input.key_features_list,
+            user_input.build_features_paragraph(),
+        )
+
+    return sum(
+        outcome(per_object) != outcome(columnar)
+        for (_, per_object), (_, columnar) in zip(
+            batch.read_rows(io.StringIO(text), input_format),
+            batch.read_columnar(io.StringIO(text), input_format),
+            strict=True,
+        )
+    )
+
+
+def run_bulk_benchmark(rows: int):
+    """Per-listing cost of reading, validating and deriving key features and features
+    paragraphs, one UserInput at a time vs in columnar chunks, for CSV and NDJSON input.
+    Both paths are first checked to read the corpus and `bulk_edge_cases()` the same way.
+    """
+    listings = bulk_corpus(rows)
+    for input_format, text in bulk_inputs(listings[:1000] + bulk_edge_cases()).items():
+        if mismatches := bulk_mismatches(text, input_format):
+            raise SystemExit(f"{input_format}: {mismatches} listings differ with --columnar")
+    inputs = bulk_inputs(listings)
+
+    def derive(rows_read):
+        for _, listing in rows_read:
+            user_input = batch.parse_listing(listing)
+            user_input.key_features_list
+            user_input.build_features_paragraph()
+
+    print(f"{'input':<6} {'path':<12} {'us/listing':>11} {'listings/s':>12}")
+    for input_format, text in inputs.items():
+        timings = {}
+        for path, read in (("per-object", batch.read_rows), ("columnar", batch.read_columnar)):
+            start = time.perf_counter()
+            derive(read(io.StringIO(text), input_format))
+            timings[path] = time.perf_counter() - start
+            seconds = timings[path]
+            print(f"{input_format:<6} {path:<12} {seconds / rows * 1e6:11.2f} {rows / seconds:12,.0f}")
+        speedup = timings["per-object"] / timings["columnar"]
+        print(f"{input_format:<6} {'speedup':<12} {speedup:10.1f}x")
+
+
+def use_fake_models(
+    latency: float,
+    latency_spread: float = 0.0,
+    distribution: LatencyDistribution = "constant",
+    seed: int = 0,
+):
+    # Fake models carry the real model names so that token costs can be priced.
+    def fake(model_name: str, model_seed: int) -> FakeChatModel:
+        return FakeChatModel(
+            model_name=model_name,
+            latency=latency,
+            latency_spread=latency_spread,
+            distribution=distribution,
+            seed=model_seed,
+        )
+
+    graph.use_models(fake("gpt-4o", seed), fake("gpt-4o-mini", seed + 1), fake("gpt-4o", seed + 2))
+
+
+def percentile(values: list[float], percent: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * percent / 100))]
+
+
+def sample_listings(count: int) -> list[dict]:
+    """Distinct variations of the sample listing, so that no two requests share a graph run."""
+    listings = []
+    for index in range(count):
+        listing = json.loads(json.dumps(SAMPLE_INPUT))
+        listing["price"] += index
+        listing["property_features"]["bedrooms"] = 1 + index % 5
+        listings.append(listing)
+    return listings
+
+
+@dataclass
+class SuiteResult:
+    target: str
+    mode: str
+    listings: int
+    concurrency: int
+    elapsed: float
+    throughput: float
+    p50: float
+    p95: float
+    p99: float
+    peak_memory_mb: float
+    # "run": peak Python allocations during this run (--trace-memory); "process": the peak
+    # resident set size of the whole benchmark process so far, which never goes down.
+    memory_scope: str = "process"
+
+    @property
+    def key(self) -> tuple:
+        return self.target, self.mode, self.listings, self.concurrency
+
+
+async def _run_target(
+    target: str,
+    client: httpx.AsyncClient,
+    listings: list[dict],
+    concurrency: int,
+    mode: PipelineMode,
+    bypass_cache: bool,
+) -> tuple[float, list[float]]:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def run_one(listing: dict):
+        async with semaphore:
+            start = time.perf_counter()
+            if target == "endpoint":
+                response = await client.post(
+                    "/generate_property_listing",
+                    params={"mode": mode, "bypass_cache": bypass_cache},
+                    json=listing,
+                )
+                response.raise_for_status()
+            else:
+                result = await graph.ainvoke_graph(UserInput(**listing), bypass_cache, mode)
+                result.to_html()
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(run_one(listing) for listing in listings))
+    return time.perf_counter() - start, latencies
+
+
+def max_rss_mb() -> float:
+    """Peak resident set size of this process since it started (ru_maxrss is in bytes on macOS)."""
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return max_rss / 2**20 if sys.platform == "darwin" else max_rss / 2**10
+
+
+async def run_suite(args: argparse.Namespace) -> list[SuiteResult]:
+    """Run every target at every listing count and concurrency level against the fake backend."""
+    use_fake_models(args.latency, args.latency_spread, args.distribution, args.seed)
+    results = []
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+        for target, count, concurrency in itertools.product(
+            args.targets, args.listings, args.concurrency
+        ):
+            listings = sample_listings(count)
+            if args.trace_memory:
+                tracemalloc.start()
+            elapsed, latencies = await _run_target(
+                target, client, listings, concurrency, args.mode, not args.use_cache
+            )
+            if args.trace_memory:
+                peak_memory_mb = tracemalloc.get_traced_memory()[1] / 2**20
+                tracemalloc.stop()
+            else:
+                peak_memory_mb = max_rss_mb()
+            results.append(
+                SuiteResult(
+                    target=target,
+                    mode=args.mode,
+                    listings=count,
+                    concurrency=concurrency,
+                    elapsed=elapsed,
+                    throughput=count / elapsed,
+                    p50=percentile(latencies, 50),
+                    p95=percentile(latencies, 95),
+                    p99=percentile(latencies, 99),
+                    peak_memory_mb=peak_memory_mb,
+                    memory_scope="run" if args.trace_memory else "process",
+                )
+            )
+            print_suite_result(results[-1])
+    return results
+
+
+def print_suite_result(result: SuiteResult):
+    print(
+        f"{result.target:<9} {result.mode:<12} n={result.listings:<5} c={result.concurrency:<4} "
+        f"{result.throughput:9.1f} listings/s  p50 {result.p50 * 1000:8.1f}ms  "
+        f"p95 {result.p95 * 1000:8.1f}ms  p99 {result.p99 * 1000:8.1f}ms  "
+        f"{'run mem' if result.memory_scope == 'run' else 'max rss'} {result.peak_memory_mb:7.1f}MB"
+    )
+
+
+def find_regressions(
+    results: list[SuiteResult], baseline: list[SuiteResult], tolerance: float
+) -> list[str]:
+    """Compare against a saved run; throughput may drop and p95 may rise by `tolerance` at most."""
+    baseline_by_key = {result.key: result for result in baseline}
+    regressions = []
+    for result in results:
+        if (previous := baseline_by_key.get(result.key)) is None:
+            continue
+        if result.throughput < previous.throughput * (1 - tolerance):
+            regressions.append(
+                f"{result.key}: throughput {previous.throughput:.1f} -> {result.throughput:.1f} listings/s"
+            )
+        if result.p95 > previous.p95 * (1 + tolerance):
+            regressions.append(
+                f"{result.key}: p95 {previous.p95 * 1000:.1f} -> {result.p95 * 1000:.1f} ms"
+            )
+    return regressions
+
+
+async def run_mode_comparison(listings: int, latency: float, live: bool):
+    """Compare latency, token usage and cost of each pipeline mode on the sample listing."""
+    if not live:
+        use_fake_models(latency)
+    user_input = UserInput(**SAMPLE_INPUT)
+    print(f"{'mode':<12} {'p50 s':>8} {'mean s':>8} {'in tok':>8} {'out tok':>8} {'USD':>10}  (per listing)")
+    for mode in get_args(PipelineMode):
+        latencies = []
+        with get_usage_metadata_callback() as usage:
+            for _ in range(listings):
+                start = time.perf_counter()
+                await graph.ainvoke_graph(user_input, bypass_cache=True, mode=mode)
+                latencies.append(time.perf_counter() - start)
+        input_tokens = sum(u["input_tokens"] for u in usage.usage_metadata.values())
+        output_tokens = sum(u["output_tokens"] for u in usage.usage_metadata.values())
+        cost = sum(
+            cost_usd(model_name, u["input_tokens"], u["output_tokens"])
+            for model_name, u in usage.usage_metadata.items()
+        )
+        print(
+            f"{mode:<12} {percentile(latencies, 50):8.3f} {statistics.mean(latencies):8.3f} "
+            f"{input_tokens / listings:8.0f} {output_tokens / listings:8.0f} {cost / listings:10.5f}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Listing pipeline benchmarks")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    construction = subparsers.add_parser(
+        "construction", help="Per-request graph and prompt construction overhead"
+    )
+    construction.add_argument("--requests", type=int, default=500)
+
+    suite = subparsers.add_parser(
+        "suite", help="Throughput, latency percentiles and memory against the fake LLM"
+    )
+    suite.add_argument("--targets", nargs="+", choices=["graph", "endpoint"], default=["graph", "endpoint"])
+    suite.add_argument("--listings", type=int, nargs="+", default=[50, 200])
+    suite.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32, 128])
+    suite.add_argument("--mode", choices=get_args(PipelineMode), default="graph")
+    suite.add_argument("--latency", type=float, default=0.05, help="Typical fake LLM latency in seconds")
+    suite.add_argument("--latency-spread", type=float, default=0.0)
+    suite.add_argument("--distribution", choices=get_args(LatencyDistribution), default="constant")
+    suite.add_argument("--seed", type=int, default=0)
+    suite.add_argument("--use-cache", action="store_true", help="Let the LLM cache serve repeated calls")
+    suite.add_argument("--trace-memory", action="store_true", help="Measure peak Python allocations per run (slower) instead of the process's peak RSS")
+    suite.add_argument("--save", help="Write results to this JSON file")
+    suite.add_argument("--baseline", help="JSON file from an earlier --save to compare against")
+    suite.add_argument("--tolerance", type=float, default=0.2)
+
+    modes = subparsers.add_parser(
+        "modes", help="Latency, tokens and cost of the multi-node graph vs single-shot"
+    )
+    modes.add_argument("--listings", type=int, default=10)
+    modes.add_argument("--latency", type=float, default=0.5, help="Fake LLM latency in seconds")
+    modes.add_argument("--live", action="store_true", help="Call OpenAI instead of the fake LLM")
+
+    render = subparsers.add_parser(
+        "render", help="HTML and JSON-LD rendering throughput vs the old to_html"
+    )
+    render.add_argument("--listings", type=int, default=20_000)
+
+    prompt_tokens = subparsers.add_parser(
+        "prompts", help="Prompt tokens per listing before and after prompt budgets"
+    )
+    prompt_tokens.add_argument("--listings", type=int, default=1000)
+
+    bulk = subparsers.add_parser(
+        "bulk", help="Per-listing validation and feature derivation: per-object vs columnar"
+    )
+    bulk.add_argument("--rows", type=int, default=100_000)
+
+    args = parser.parse_args()
+    if args.command == "construction":
+        run_construction_benchmark(args.requests)
+    elif args.command == "suite":
+        results = asyncio.run(run_suite(args))
+        if args.save:
+            Path(args.save).write_text(json.dumps([asdict(result) for result in results], indent=2))
+        if args.baseline:
+            baseline = [SuiteResult(**row) for row in json.loads(Path(args.baseline).read_text())]
+            if regressions := find_regressions(results, baseline, args.tolerance):
+                print("Regressions against baseline:", *regressions, sep="\n  ")
+                sys.exit(1)
+    elif args.command == "modes":
+        asyncio.run(run_mode_comparison(args.listings, args.latency, args.live))
+    elif args.command == "render":
+        run_render_benchmark(args.listings)
+    elif args.command == "prompts":
+        run_prompt_benchmark(args.listings)
+    elif args.command == "bulk":
+        run_bulk_benchmark(args.rows)
+
+
+if __name__ == "__main__":
+    main()
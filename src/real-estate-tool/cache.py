@@ -0,0 +1,192 @@
+from __future__ import annotations
+
+import functools
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Callable
+
+from dotenv import load_dotenv
+from langchain_core.messages import BaseMessage
+from pydantic import BaseModel
+
+logger = logging.getLogger(__name__)
+
+DAY = 24 * 60 * 60
+
+# Seconds a cached response stays valid per node. Nodes that are not listed use DEFAULT_TTL;
+# a TTL of 0 disables caching for that node.
+NODE_TTLS: dict[str, float] = {
+    "generate_neigborhood_summary": 30 * DAY,
+    "generate_adjectives": 7 * DAY,
+    "generate_title": 7 * DAY,
+    "generate_headline": DAY,
+    "generate_full_description": DAY,
+    "generate_meta_description": DAY,
+    "translate_section": 30 * DAY,
+}
+DEFAULT_TTL = DAY
+
+
+class CacheBackend(ABC):
+    @abstractmethod
+    def get(self, key: str) -> str | None: ...
+
+    @abstractmethod
+    def set(self, key: str, value: str, ttl: float): ...
+
+    @abstractmethod
+    def clear(self): ...
+
+
+class InMemoryLRUCache(CacheBackend):
+    def __init__(self, max_entries: int = 10_000):
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, tuple[float, str]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> str | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: str, ttl: float):
+        with self._lock:
+            self._entries[key] = (time.time() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class SQLiteCache(CacheBackend):
+    """Expired rows are never read back, and are deleted when the cache is opened and then on
+    the first `set` after each `purge_interval` seconds.
+    """
+
+    def __init__(self, path: str = "llm_cache.sqlite3", purge_interval: float = 60 * 60):
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        self.purge_interval = purge_interval
+        with self._lock, self._connection:
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS llm_cache "
+                "(key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            self._purge_expired(time.time())
+
+    def get(self, key: str) -> str | None:
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT value FROM llm_cache WHERE key = ? AND expires_at >= ?",
+                (key, time.time()),
+            ).fetchone()
+        return row[0] if row else None
+
+    def set(self, key: str, value: str, ttl: float):
+        now = time.time()
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, value, now + ttl),
+            )
+            if now - self._last_purge >= self.purge_interval:
+                self._purge_expired(now)
+
+    def _purge_expired(self, now: float):
+        self._connection.execute("DELETE FROM llm_cache WHERE expires_at < ?", (now,))
+        self._last_purge = now
+
+    def clear(self):
+        with self._lock, self._connection:
+            self._connection.execute("DELETE FROM llm_cache")
+
+
+@functools.cache
+def schema_fingerprint(schema: type[BaseModel]) -> str:
+    """The name and a hash of the JSON schema of a structured output, so that entries written
+    before the schema changed are never read back.
+    """
+    json_schema = json.dumps(schema.model_json_schema(), sort_keys=True)
+    return f"{schema.__name__}:{hashlib.sha256(json_schema.encode()).hexdigest()[:16]}"
+
+
+class LLMCache:
+    """Caches LLM node outputs keyed by a hash of what was actually sent to the model."""
+
+    def __init__(self, backend: CacheBackend | None, node_ttls: dict[str, float] | None = None):
+        self.backend = backend
+        self.node_ttls = NODE_TTLS if node_ttls is None else node_ttls
+
+    @staticmethod
+    def make_key(
+        node: str,
+        model: str,
+        temperature: float | None,
+        messages: list[BaseMessage],
+        schema: type[BaseModel] | None = None,
+    ) -> str:
+        payload = json.dumps(
+            [
+                node,
+                model,
+                temperature,
+                [(m.type, m.content) for m in messages],
+                schema_fingerprint(schema) if schema else None,
+            ],
+            ensure_ascii=False,
+        )
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def ttl(self, node: str) -> float:
+        return self.node_ttls.get(node, DEFAULT_TTL)
+
+    def enabled_for(self, node: str) -> bool:
+        return self.backend is not None and self.ttl(node) > 0
+
+    def get(self, node: str, key: str, decode: Callable[[str], object] | None = None):
+        """The cached value, passed through `decode` if given. A value that `decode` rejects
+        (e.g. a structured output that no longer validates) is treated as a miss.
+        """
+        value = self.backend.get(key)
+        if value is not None and decode is not None:
+            try:
+                value = decode(value)
+            except ValueError as error:
+                logger.warning("Ignoring cached %s output that fails to decode: %s", node, error)
+                value = None
+        return value
+
+    def set(self, node: str, key: str, value: str):
+        self.backend.set(key, value, self.ttl(node))
+
+
+def cache_from_env() -> LLMCache:
+    backend_name = os.getenv("LLM_CACHE_BACKEND", "memory")
+    if backend_name == "sqlite":
+        backend = SQLiteCache(os.getenv("LLM_CACHE_PATH", "llm_cache.sqlite3"))
+    elif backend_name == "memory":
+        backend = InMemoryLRUCache(int(os.getenv("LLM_CACHE_MAX_ENTRIES", "10000")))
+    else:
+        backend = None
+    return LLMCache(backend)
+
+
+load_dotenv()
+llm_cache = cache_from_env()
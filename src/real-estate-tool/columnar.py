@@ -0,0 +1,396 @@
+"""Columnar validation and feature derivation for large batches of listings.
+
+A batch is loaded into a DataFrame with one column per field, validated and normalized a
+column at a time, and its key features and features paragraphs are built for every listing at
+once. The results match what `UserInput` produces one listing at a time, and are carried by
+`PreparedUserInput`s so that the graph does not rebuild them.
+"""
+
+import contextlib
+import functools
+import gc
+import string
+from typing import Iterable, TypeVar, get_args
+
+import numpy as np
+import pandas as pd
+from locales import LOCALES
+from models import (
+    LocationDetails,
+    PreparedUserInput,
+    PropertyFeatures,
+    UserInput,
+    title_case_name,
+)
+from pydantic import BaseModel
+
+ModelT = TypeVar("ModelT", bound=BaseModel)
+
+TEXT_FIELDS = ("title", "city", "neighborhood")
+INTEGER_FIELDS = ("bedrooms", "bathrooms", "area_sqm", "floor", "year_built", "price")
+BOOLEAN_FIELDS = ("balcony", "parking", "elevator")
+CHOICE_FIELDS = {
+    field: get_args(UserInput.model_fields[field].annotation)
+    for field in ("listing_type", "language")
+}
+REQUIRED_FIELDS = ("title", "city", "neighborhood", "price", "listing_type")
+# Integers are parsed through floats, which hold every integer below this exactly. Other
+# values, and integers written in forms that pydantic reads but `_parse_integers` does not
+# (e.g. "1_000" or " 12 "), fail here and are validated again one listing at a time.
+MAX_EXACT_INTEGER = 2**53
+# The strings pydantic accepts for booleans.
+BOOLEAN_STRINGS = {
+    **dict.fromkeys(("true", "1", "yes", "y", "on", "t"), True),
+    **dict.fromkeys(("false", "0", "no", "n", "off", "f"), False),
+}
+BOOLEAN_VALUES = {
+    True: True,
+    False: False,
+    **{
+        spelling: value
+        for string, value in BOOLEAN_STRINGS.items()
+        for spelling in (string, string.upper(), string.title())
+    },
+}
+
+
+def flatten_listing(item: dict) -> dict:
+    """One row per listing, from the API, `UserInput.from_dict` or flat CSV shape."""
+    row = {
+        key: value
+        for key, value in item.items()
+        if key not in ("location_details", "location", "property_features", "features")
+    }
+    row.update(item.get("location_details") or item.get("location") or {})
+    row.update(item.get("property_features") or item.get("features") or {})
+    return row
+
+
+def listings_frame(items: Iterable[dict]) -> pd.DataFrame:
+    # Object columns keep values as given (e.g. integer ids stay integers when some are
+    # missing); validate() converts them.
+    return pd.DataFrame([flatten_listing(item) for item in items], dtype=object)
+
+
+def _is_text(values: pd.Series) -> pd.Series:
+    if pd.api.types.infer_dtype(values, skipna=True) in ("string", "empty"):
+        return pd.Series(True, index=values.index)
+    return values.map(lambda value: isinstance(value, str))
+
+
+def _parse_integer_strings(strings: np.ndarray) -> np.ndarray:
+    """Strings of ASCII digits with an optional minus sign as floats, and NaN for the others
+    (e.g. "1e3", "12.0" or " 12 ").
+    """
+    negative = np.strings.startswith(strings, "-")
+    digits = np.strings.lstrip(strings, "-")
+    length = np.strings.str_len(digits)
+    plain = (
+        (length == np.strings.str_len(strings) - negative)
+        & (length > 0)
+        & (length < len(str(MAX_EXACT_INTEGER)))
+        & (np.strings.lstrip(digits, "0123456789") == "")
+    )
+    numbers = np.full(len(strings), np.nan)
+    numbers[plain] = digits[plain].astype(np.int64) * np.where(negative[plain], -1, 1)
+    return numbers
+
+
+def _parse_integers(values: pd.Series) -> tuple[pd.Series, pd.Series]:
+    """The values as floats, and where they are set but are not plain integers: ints and
+    integral floats (but not bools), or strings that `_parse_integer_strings` reads.
+    """
+    kind = pd.api.types.infer_dtype(values, skipna=True)
+    if kind in ("integer", "floating", "mixed-integer-float", "empty"):
+        numbers = pd.to_numeric(values)
+    else:
+        numbers = pd.Series(np.nan, index=values.index)
+        text = _is_text(values) & values.notna()
+        if text.any():
+            numbers[text] = _parse_integer_strings(values[text].to_numpy(dtype=str))
+        others = values[values.notna() & ~text]
+        others = others[others.map(type).isin((int, float))]
+        if len(others):
+            numbers[others.index] = pd.to_numeric(others, errors="coerce").astype(float)
+    exact = (numbers.abs() < MAX_EXACT_INTEGER) & (numbers % 1 == 0)
+    return numbers.where(exact), values.notna() & ~exact
+
+
+def _parse_booleans(values: pd.Series) -> pd.Series:
+    # JSON booleans (and 0/1) and the usual spellings are looked up as they are; only the
+    # rest are lowercased.
+    parsed = values.map(BOOLEAN_VALUES)
+    rest = parsed.isna() & values.notna()
+    if rest.any():
+        parsed[rest] = values[rest].astype(str).str.lower().map(BOOLEAN_STRINGS)
+    return parsed
+
+
+def validate(frame: pd.DataFrame) -> tuple[pd.DataFrame, pd.Series]:
+    """Validate and normalize `frame`, returning the valid rows with typed columns and an
+    error message for each invalid row, both keyed by the row's index.
+    """
+    missing = pd.Series(None, index=frame.index, dtype=object)
+    failures: list[tuple[np.ndarray, str]] = []
+    normalized = pd.DataFrame(index=frame.index)
+
+    def column(field: str) -> pd.Series:
+        return frame[field] if field in frame else missing
+
+    def fail(invalid: pd.Series, message: str):
+        invalid = invalid.to_numpy(dtype=bool)
+        if invalid.any():
+            failures.append((invalid, message))
+
+    for field in REQUIRED_FIELDS:
+        fail(column(field).isna(), f"{field}: field required")
+
+    for field in TEXT_FIELDS:
+        values = column(field)
+        is_text = _is_text(values)
+        fail(values.notna() & ~is_text, f"{field}: not a string")
+        # Rows with values that are not strings fail; they are left out of normalization.
+        normalized[field] = values.astype(object).where(is_text)
+    # City and neighborhood are title-cased, as LocationDetails does, once per distinct name.
+    for field in LocationDetails.model_fields:
+        names = normalized[field]
+        cased = {name: title_case_name(name) for name in names.dropna().unique()}
+        normalized[field] = names.map(cased)
+
+    for field in INTEGER_FIELDS:
+        numbers, invalid = _parse_integers(column(field))
+        fail(invalid, f"{field}: not an integer")
+        normalized[field] = numbers.astype("Int64")
+
+    for field in BOOLEAN_FIELDS:
+        values = column(field)
+        parsed = _parse_booleans(values)
+        fail(values.notna() & parsed.isna(), f"{field}: not a boolean")
+        normalized[field] = parsed.astype("boolean")
+
+    # Only a missing language defaults to English; an explicit null is invalid.
+    language = column("language")
+    if "language" in frame:
+        fail(language.map(lambda value: value is None), "language: not a string")
+    normalized["language"] = language.fillna("en")
+    normalized["listing_type"] = column("listing_type")
+    for field, choices in CHOICE_FIELDS.items():
+        values = normalized[field]
+        invalid = values.notna() & ~values.isin(choices)
+        fail(invalid, f"{field}: expected one of {', '.join(choices)}")
+
+    invalid = np.zeros(len(frame), dtype=bool)
+    for rows, _ in failures:
+        invalid |= rows
+    errors = pd.Series(
+        [
+            "; ".join(message for rows, message in failures if rows[position])
+            for position in np.flatnonzero(invalid)
+        ],
+        index=frame.index[invalid],
+        dtype=object,
+    )
+    return normalized[~invalid], errors
+
+
+# Derived strings are built on object arrays: numpy applies `+` and `where` to whole columns
+# in one C loop, which is much cheaper than pandas string operations here.
+
+
+def _text(column: pd.Series) -> np.ndarray:
+    if pd.api.types.is_integer_dtype(column.dtype):
+        return column.to_numpy(dtype=np.int64, na_value=0).astype(str).astype(object)
+    return column.to_numpy(dtype=object)
+
+
+def _mask(column: pd.Series) -> np.ndarray:
+    """Where the value is truthy, as in the `if value:` checks of UserInput."""
+    return column.to_numpy(dtype=bool, na_value=False)
+
+
+def _format(template: str, **columns: np.ndarray) -> np.ndarray:
+    """`template.format(**row)` for every row, built by concatenating whole columns."""
+    result = None
+    for literal, field, _, _ in string.Formatter().parse(template):
+        parts = [literal] if literal else []
+        if field:
+            parts.append(columns[field])
+        for part in parts:
+            result = part if result is None else np.add(result, part)
+    return result
+
+
+def _key_feature_columns(frame: pd.DataFrame, language: str) -> list[np.ndarray]:
+    """The candidate key features in order, as columns that are None where a listing does not
+    have the feature.
+    """
+    strings = LOCALES[language]
+    bedrooms = _text(frame["bedrooms"])
+    bathrooms = _text(frame["bathrooms"])
+    bed_label = np.where(
+        frame["bedrooms"].eq(1).fillna(False), strings["bedroom"], strings["bedrooms"]
+    ).astype(object)
+    bath_label = np.where(
+        frame["bathrooms"].eq(1).fillna(False), strings["bathroom"], strings["bathrooms"]
+    ).astype(object)
+    rooms = np.where(
+        _mask(frame["bathrooms"]),
+        _format(
+            strings["rooms"],
+            bedrooms=bedrooms,
+            bed_label=bed_label,
+            bathrooms=bathrooms,
+            bath_label=bath_label,
+        ),
+        bedrooms + " " + bed_label,
+    )
+    location = _format(
+        strings["location"],
+        neighborhood=_text(frame["neighborhood"]),
+        city=_text(frame["city"]),
+    )
+    return [
+        np.where(
+            _mask(frame["area_sqm"]),
+            _format(strings["area"], area_sqm=_text(frame["area_sqm"])),
+            None,
+        ),
+        np.where(_mask(frame["bedrooms"]), rooms, None),
+        *(
+            np.where(_mask(frame[amenity]), strings[amenity], None)
+            for amenity in ("balcony", "elevator", "parking")
+        ),
+        location,
+    ]
+
+
+def key_features(frame: pd.DataFrame) -> list[list[str]]:
+    """`UserInput.key_features_list` for every row of a validated frame."""
+    lists = pd.Series(None, index=frame.index, dtype=object)
+    for language, group in frame.groupby("language"):
+        columns = _key_feature_columns(group, language)
+        lists[group.index] = [
+            [feature for feature in row if feature is not None] for row in zip(*columns)
+        ]
+    return lists.tolist()
+
+
+def features_paragraphs(frame: pd.DataFrame) -> list[str]:
+    """`UserInput.build_features_paragraph()` for every row of a validated frame."""
+
+    def line(template: str, field: str) -> np.ndarray:
+        filled = _format(template, **{field: _text(frame[field])})
+        return np.where(_mask(frame[field]), filled, "")
+
+    def flag(sentence: str, field: str) -> np.ndarray:
+        return np.where(_mask(frame[field]), sentence, "").astype(object)
+
+    price = np.where(
+        _mask(frame["price"]), _format(" at EUR {price}.\n", price=_text(frame["price"])), ".\n"
+    )
+    parts = [
+        _format("{title}\n", title=_text(frame["title"])),
+        line("Number of bedrooms: {bedrooms}.\n", "bedrooms"),
+        line("Number of bathrooms: {bathrooms}.\n", "bathrooms"),
+        line("The property has {area_sqm} square meters of living space.\n", "area_sqm"),
+        flag("The property has a balcony.\n", "balcony"),
+        flag("The property has a parking space.\n", "parking"),
+        flag("The property has an elevator.\n", "elevator"),
+        line("The property is located on the {floor} floor.\n", "floor"),
+        line("The property was built in {year_built}.\n", "year_built"),
+        _format(
+            "The property is available for {listing_type}",
+            listing_type=_text(frame["listing_type"]),
+        ),
+        price,
+        _format(
+            "The property is located in the {neighborhood} neighborhood of {city}.\n",
+            neighborhood=_text(frame["neighborhood"]),
+            city=_text(frame["city"]),
+        ),
+    ]
+    return functools.reduce(np.add, parts).tolist()
+
+
+def _values(column: pd.Series) -> list:
+    # Python ints and bools, with None for missing values.
+    return column.astype(object).where(column.notna(), None).tolist()
+
+
+def _construct(model: type[ModelT], values: dict) -> ModelT:
+    """`model.model_construct(**values)` for `values` that set every field of a model without
+    private attributes or `model_post_init`, without its per-call handling of defaults,
+    aliases and extra values, which costs more than validating.
+    """
+    instance = model.__new__(model)
+    object.__setattr__(instance, "__dict__", values)
+    object.__setattr__(instance, "__pydantic_fields_set__", set(values))
+    object.__setattr__(instance, "__pydantic_extra__", None)
+    object.__setattr__(instance, "__pydantic_private__", None)
+    return instance
+
+
+def user_inputs(frame: pd.DataFrame) -> list[PreparedUserInput]:
+    """`PreparedUserInput`s for a validated frame. Its columns are already typed and
+    normalized, so the models are built from them without validating them again.
+    """
+
+    def records(fields) -> Iterable[dict]:
+        columns = [_values(frame[field]) for field in fields]
+        return (dict(zip(fields, row)) for row in zip(*columns))
+
+    return [
+        _construct(
+            PreparedUserInput,
+            {
+                "title": title,
+                "location_details": _construct(LocationDetails, location_details),
+                "property_features": _construct(PropertyFeatures, property_features),
+                "price": price,
+                "listing_type": listing_type,
+                "language": language,
+                "prepared_key_features": key_features_list,
+                "prepared_features_paragraph": paragraph,
+            },
+        )
+        for (
+            title,
+            price,
+            listing_type,
+            language,
+            location_details,
+            property_features,
+            key_features_list,
+            paragraph,
+        ) in zip(
+            *(_values(frame[field]) for field in ("title", "price", "listing_type", "language")),
+            records(tuple(LocationDetails.model_fields)),
+            records(tuple(PropertyFeatures.model_fields)),
+            key_features(frame),
+            features_paragraphs(frame),
+        )
+    ]
+
+
+@contextlib.contextmanager
+def _gc_paused():
+    # A chunk allocates many small objects without reference cycles, which would otherwise
+    # trigger collections that scan the whole chunk over and over.
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
+def prepare(frame: pd.DataFrame) -> list[PreparedUserInput | ValueError]:
+    """A `PreparedUserInput` for each valid row of `frame`, or the validation error, in row
+    order.
+    """
+    with _gc_paused():
+        valid, errors = validate(frame)
+        prepared = dict(zip(valid.index, user_inputs(valid)))
+    prepared.update((index, ValueError(message)) for index, message in errors.items())
+    return [prepared[index] for index in frame.index]
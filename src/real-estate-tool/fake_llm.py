@@ -0,0 +1,130 @@
+from __future__ import annotations
+
+import asyncio
+import random
+import time
+from typing import Any, Literal, get_args, get_origin
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.runnables import RunnableLambda
+from pydantic import BaseModel, PrivateAttr
+
+
+def fake_structured_output(schema: type[BaseModel]) -> BaseModel:
+    """Build a valid instance of `schema` filled with placeholder values."""
+    values = {}
+    for name, field in schema.model_fields.items():
+        annotation = field.annotation
+        if get_origin(annotation) is list:
+            (item_type,) = get_args(annotation)
+            values[name] = [_fake_value(item_type, name), _fake_value(item_type, name)]
+        else:
+            values[name] = _fake_value(annotation, name)
+    return schema(**values)
+
+
+def _fake_value(annotation: Any, name: str) -> Any:
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return fake_structured_output(annotation)
+    if annotation is int:
+        return 1
+    if annotation is bool:
+        return True
+    return f"Lorem ipsum {name.replace('_', ' ')}"
+
+
+LatencyDistribution = Literal["constant", "uniform", "normal", "lognormal"]
+
+
+class FakeChatModel(BaseChatModel):
+    """Local stand-in for ChatOpenAI that answers with canned text after a simulated delay.
+
+    `latency` is the typical delay in seconds. `latency_spread` widens it according to
+    `distribution`: the half-width for uniform, the standard deviation for normal and the
+    sigma of the underlying normal for lognormal (where `latency` is the median). Delays are
+    drawn from a generator seeded with `seed`, so runs are reproducible.
+    """
+
+    model_name: str = "fake"
+    temperature: float = 0.0
+    latency: float = 0.0
+    latency_spread: float = 0.0
+    distribution: LatencyDistribution = "constant"
+    seed: int = 0
+    response: str = "Lorem ipsum dolor sit amet, consectetur adipiscing elit."
+    _rng: random.Random = PrivateAttr()
+
+    def model_post_init(self, context: Any):
+        self._rng = random.Random(self.seed)
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat"
+
+    def sample_latency(self) -> float:
+        if self.distribution == "uniform":
+            delay = self._rng.uniform(
+                self.latency - self.latency_spread, self.latency + self.latency_spread
+            )
+        elif self.distribution == "normal":
+            delay = self._rng.gauss(self.latency, self.latency_spread)
+        elif self.distribution == "lognormal" and self.latency > 0:
+            delay = self.latency * self._rng.lognormvariate(0, self.latency_spread)
+        else:
+            delay = self.latency
+        return max(0.0, delay)
+
+    def _result(self, messages: list[BaseMessage], response: str | None) -> ChatResult:
+        content = self.response if response is None else response
+        # Roughly four characters per token, which is close enough for comparing prompts.
+        input_tokens = sum(len(str(message.content)) for message in messages) // 4
+        output_tokens = len(content) // 4
+        message = AIMessage(
+            content=content,
+            response_metadata={"model_name": self.model_name},
+            usage_metadata={
+                "input_tokens": input_tokens,
+                "output_tokens": output_tokens,
+                "total_tokens": input_tokens + output_tokens,
+            },
+        )
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _generate(self, messages: list[BaseMessage], stop=None, run_manager=None, response=None, **kwargs) -> ChatResult:
+        time.sleep(self.sample_latency())
+        return self._result(messages, response)
+
+    async def _agenerate(self, messages: list[BaseMessage], stop=None, run_manager=None, response=None, **kwargs) -> ChatResult:
+        await asyncio.sleep(self.sample_latency())
+        return self._result(messages, response)
+
+    async def _astream(self, messages: list[BaseMessage], stop=None, run_manager=None, **kwargs):
+        words = self.response.split(" ")
+        latency = self.sample_latency()
+        for position, word in enumerate(words):
+            await asyncio.sleep(latency / len(words))
+            chunk = ChatGenerationChunk(
+                message=AIMessageChunk(content=word if position == 0 else f" {word}")
+            )
+            if run_manager:
+                await run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+            yield chunk
+
+    def with_structured_output(self, schema, include_raw: bool = False, **kwargs):
+        # Answers go through the model itself so callbacks see the latency and token usage.
+        def wrap(output, raw):
+            if include_raw:
+                return {"raw": raw, "parsed": output, "parsing_error": None}
+            return output
+
+        def respond(messages):
+            output = fake_structured_output(schema)
+            return wrap(output, self.invoke(messages, response=output.model_dump_json()))
+
+        async def arespond(messages):
+            output = fake_structured_output(schema)
+            return wrap(output, await self.ainvoke(messages, response=output.model_dump_json()))
+
+        return RunnableLambda(respond, afunc=arespond)
@@ -0,0 +1,211 @@
+"""A local OpenAI-compatible chat completions server with simulated latency and failures.
+
+Point the app at it with OPENAI_BASE_URL=http://localhost:8001/v1 to exercise retries,
+timeouts, hedging and rate limiting without calling OpenAI.
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import time
+import uuid
+from typing import Any
+
+from fake_llm import FakeChatModel, LatencyDistribution
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import BaseModel
+
+LOREM = "Lorem ipsum dolor sit amet, consectetur adipiscing elit, sed do eiusmod tempor."
+
+
+class FaultSettings(BaseModel):
+    # Fraction of requests answered with 429 (with a Retry-After header) or 500.
+    rate_limit_rate: float = 0.0
+    server_error_rate: float = 0.0
+    # Fraction of requests delayed by `slow_latency` seconds, to trigger timeouts and hedging.
+    slow_rate: float = 0.0
+    slow_latency: float = 30.0
+    retry_after: float = 0.1
+
+
+def fake_from_json_schema(schema: dict, definitions: dict | None = None, name: str = "value") -> Any:
+    """Build a placeholder value matching a JSON schema, as sent in `response_format` or tools."""
+    definitions = {**(definitions or {}), **schema.get("$defs", {})}
+    if "$ref" in schema:
+        return fake_from_json_schema(definitions[schema["$ref"].split("/")[-1]], definitions, name)
+    if "anyOf" in schema:
+        return fake_from_json_schema(schema["anyOf"][0], definitions, name)
+    schema_type = schema.get("type")
+    if isinstance(schema_type, list):
+        schema_type = schema_type[0]
+    if schema_type == "object":
+        return {
+            key: fake_from_json_schema(value, definitions, key)
+            for key, value in schema.get("properties", {}).items()
+        }
+    if schema_type == "array":
+        item = schema.get("items", {})
+        return [fake_from_json_schema(item, definitions, name) for _ in range(2)]
+    if schema_type in ("integer", "number"):
+        return 1
+    if schema_type == "boolean":
+        return True
+    if "enum" in schema:
+        return schema["enum"][0]
+    return f"Lorem ipsum {name.replace('_', ' ')}"
+
+
+def _count_tokens(text: str) -> int:
+    return len(text) // 4
+
+
+def _completion_message(body: dict) -> dict:
+    response_format = body.get("response_format") or {}
+    if response_format.get("type") == "json_schema":
+        content = json.dumps(fake_from_json_schema(response_format["json_schema"]["schema"]))
+        return {"role": "assistant", "content": content}
+    if response_format.get("type") == "json_object":
+        return {"role": "assistant", "content": "{}"}
+    if tools := body.get("tools"):
+        function = tools[0]["function"]
+        arguments = json.dumps(fake_from_json_schema(function.get("parameters", {})))
+        return {
+            "role": "assistant",
+            "content": None,
+            "tool_calls": [
+                {
+                    "id": f"call_{uuid.uuid4().hex[:12]}",
+                    "type": "function",
+                    "function": {"name": function["name"], "arguments": arguments},
+                }
+            ],
+        }
+    return {"role": "assistant", "content": LOREM}
+
+
+def _usage(body: dict, message: dict) -> dict:
+    prompt = "".join(str(item.get("content") or "") for item in body.get("messages", []))
+    completion = message.get("content") or json.dumps(message.get("tool_calls", ""))
+    prompt_tokens, completion_tokens = _count_tokens(prompt), _count_tokens(completion)
+    return {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "total_tokens": prompt_tokens + completion_tokens,
+    }
+
+
+def create_app(
+    latency: float = 0.2,
+    latency_spread: float = 0.0,
+    distribution: LatencyDistribution = "constant",
+    seed: int = 0,
+    faults: FaultSettings | None = None,
+) -> FastAPI:
+    app = FastAPI()
+    latency_model = FakeChatModel(
+        latency=latency, latency_spread=latency_spread, distribution=distribution, seed=seed
+    )
+    faults = faults or FaultSettings()
+    rng = random.Random(seed)
+    app.state.requests = 0
+
+    def error(status: int, kind: str, headers: dict | None = None) -> JSONResponse:
+        return JSONResponse(
+            {"error": {"message": f"Simulated {kind}", "type": kind, "code": None}},
+            status_code=status,
+            headers=headers,
+        )
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        app.state.requests += 1
+        body = await request.json()
+        roll = rng.random()
+        if roll < faults.rate_limit_rate:
+            return error(429, "rate_limit_exceeded", {"retry-after": str(faults.retry_after)})
+        if roll < faults.rate_limit_rate + faults.server_error_rate:
+            return error(500, "server_error")
+        delay = latency_model.sample_latency()
+        if rng.random() < faults.slow_rate:
+            delay = faults.slow_latency
+
+        message = _completion_message(body)
+        usage = _usage(body, message)
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        created = int(time.time())
+        model = body.get("model", "fake")
+
+        if not body.get("stream"):
+            await asyncio.sleep(delay)
+            return {
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "message": message, "finish_reason": "stop"}],
+                "usage": usage,
+            }
+
+        def chunk(delta: dict, finish_reason: str | None = None, **extra) -> str:
+            payload = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+                **extra,
+            }
+            return f"data: {json.dumps(payload)}\n\n"
+
+        async def events():
+            words = (message.get("content") or "").split(" ")
+            yield chunk({"role": "assistant", "content": ""})
+            for position, word in enumerate(words):
+                await asyncio.sleep(delay / len(words))
+                yield chunk({"content": word if position == 0 else f" {word}"})
+            yield chunk({}, "stop")
+            if (body.get("stream_options") or {}).get("include_usage"):
+                payload = {
+                    "id": completion_id,
+                    "object": "chat.completion.chunk",
+                    "created": created,
+                    "model": model,
+                    "choices": [],
+                    "usage": usage,
+                }
+                yield f"data: {json.dumps(payload)}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    return app
+
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Fake OpenAI-compatible chat completions server")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--latency-spread", type=float, default=0.0)
+    parser.add_argument("--distribution", default="constant")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--server-error-rate", type=float, default=0.0)
+    parser.add_argument("--slow-rate", type=float, default=0.0)
+    parser.add_argument("--slow-latency", type=float, default=30.0)
+    args = parser.parse_args()
+    faults = FaultSettings(
+        rate_limit_rate=args.rate_limit_rate,
+        server_error_rate=args.server_error_rate,
+        slow_rate=args.slow_rate,
+        slow_latency=args.slow_latency,
+    )
+    app = create_app(args.latency, args.latency_spread, args.distribution, args.seed, faults)
+    uvicorn.run(app, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
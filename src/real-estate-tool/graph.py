@@ -1,30 +1,215 @@
+import asyncio
+import hashlib
+import logging
+import threading
+import time
+import uuid
+from functools import wraps
+from typing import AsyncIterator, Awaitable, Callable
+
+import listing_templates
+import llm_client
+import metrics
 import prompts
+from cache import llm_cache
 from dotenv import load_dotenv
-from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import BaseMessage
+from langchain_core.runnables import Runnable
 from langchain_openai import ChatOpenAI
+from langgraph.checkpoint.base import BaseCheckpointSaver
+from langgraph.checkpoint.memory import InMemorySaver
+from langgraph.config import get_config
 from langgraph.graph import END, START, StateGraph
-from models import OutputState, PropertyAdjectives, State, UserInput
+from langgraph.graph.state import CompiledStateGraph
+from models import (
+    ListingDraft,
+    OutputState,
+    PipelineMode,
+    PropertyAdjectives,
+    State,
+    UserInput,
+)
+from neighborhoods import neighborhood_store
+from pydantic import BaseModel
+from routing import router
+from single_flight import SingleFlight
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
 
-llm = ChatOpenAI(model="gpt-4o", temperature=0.6)
-llm_mini = ChatOpenAI(model="gpt-4o-mini", temperature=0.3)
-translator = ChatOpenAI(model="gpt-4o", temperature=0.0).with_structured_output(
-    OutputState
+# Retries and timeouts are handled by llm_client so that they respect the rate limits.
+llm = ChatOpenAI(
+    model="gpt-4o",
+    temperature=0.6,
+    stream_usage=True,
+    max_retries=0,
+    http_async_client=llm_client.http_async_client,
 )
-
-
-def translate_to_portuguese(state: State):
-    original_output = OutputState(**state)
-    messages = ChatPromptTemplate(
-        [
-            ("system", prompts.translator_system_prompt),
-            ("user", original_output.to_str()),
-        ]
-    ).format_messages()
-    translated_output = translator.invoke(messages)
-    return translated_output.dict()
+llm_mini = ChatOpenAI(
+    model="gpt-4o-mini",
+    temperature=0.3,
+    stream_usage=True,
+    max_retries=0,
+    http_async_client=llm_client.http_async_client,
+)
+translator = ChatOpenAI(
+    model="gpt-4o",
+    temperature=0.0,
+    stream_usage=True,
+    max_retries=0,
+    http_async_client=llm_client.http_async_client,
+)
+_structured_models: dict[tuple[int, type[BaseModel]], Runnable] = {}
+
+# Identical LLM calls (same cache key) and identical listings that are in flight at the same
+# time share one execution instead of each missing the cache.
+llm_flights = SingleFlight()
+listing_flights = SingleFlight()
+
+
+def structured_model(model: BaseChatModel, schema: type[BaseModel]) -> Runnable:
+    """`model.with_structured_output(schema, include_raw=True)`, built once per model."""
+    key = (id(model), schema)
+    if key not in _structured_models:
+        _structured_models[key] = model.with_structured_output(schema, include_raw=True)
+    return _structured_models[key]
+
+
+def route(node: str, default: str, template: bool = False) -> BaseChatModel | None:
+    """Pick the model for `node` from routing.toml; None means the deterministic template.
+
+    `template` says whether a template result is available; the "fast" mode always uses it.
+    """
+    models = {"main": llm, "translator": translator, "mini": llm_mini}
+    if template and get_config().get("configurable", {}).get("mode") == "fast":
+        tier = "template"
+    else:
+        tier = router.choose(node, [*models, "template"] if template else models, default)
+    metrics.model_routes.inc(node, tier)
+    return models.get(tier)
+
+
+def routed(node: str, model: BaseChatModel | None) -> dict:
+    """State update recording which model served `node`."""
+    name = "template" if model is None else getattr(model, "model_name", type(model).__name__)
+    return {"model_routes": {node: name}}
+
+
+async def cached_ainvoke(
+    node: str,
+    model: BaseChatModel,
+    runnable: Runnable,
+    messages: list[BaseMessage],
+    schema: type[BaseModel] | None = None,
+):
+    """Call `runnable` (`model`, or a structured-output wrapper of it built with
+    include_raw=True) through llm_cache, recording latency, tokens and cache status.
+
+    Returns the message content, or an instance of `schema` for structured calls.
+    """
+    model_name = getattr(model, "model_name", type(model).__name__)
+    start = time.perf_counter()
+
+    async def invoke():
+        response = await runnable.ainvoke(messages)
+        if not schema:
+            return response.content, response.usage_metadata or {}
+        if response["parsing_error"]:
+            raise response["parsing_error"]
+        return response["parsed"], response["raw"].usage_metadata or {}
+
+    # Identical calls in flight at the same time share one model call whether or not the
+    # cache is used; bypassing it only skips the cache read and write.
+    bypass = get_config().get("configurable", {}).get("bypass_cache", False)
+    use_cache = not bypass and llm_cache.enabled_for(node)
+    key = llm_cache.make_key(
+        node, model_name, getattr(model, "temperature", None), messages, schema
+    )
+    decode = schema.model_validate_json if schema else None
+    if use_cache and (cached := llm_cache.get(node, key, decode)) is not None:
+        metrics.record_llm_call(node, model_name, "hit", {}, time.perf_counter() - start)
+        return cached
+
+    async def call():
+        result, usage, retries = await llm_client.resilient_call(
+            node, model_name, messages, invoke
+        )
+        if use_cache:
+            llm_cache.set(node, key, result.model_dump_json() if schema else result)
+        return result, usage, retries
+
+    (result, usage, retries), shared = await llm_flights.do(key, call)
+    if shared:
+        metrics.record_llm_call(
+            node, model_name, "coalesced", {}, time.perf_counter() - start
+        )
+    else:
+        metrics.record_llm_call(
+            node,
+            model_name,
+            "miss" if use_cache else "bypass",
+            usage,
+            time.perf_counter() - start,
+            retries,
+        )
+    return result
+
+
+TRANSLATED_SECTIONS = [
+    "title",
+    "headline",
+    "meta_description",
+    "full_description",
+    "neighborhood_summary",
+]
+SECTION_NODES = {
+    "title": "generate_title",
+    "headline": "generate_headline",
+    "meta_description": "generate_meta_description",
+    "full_description": "generate_full_description",
+    "neighborhood_summary": "generate_neigborhood_summary",
+}
+
+
+async def translate_section(text: str, model: BaseChatModel) -> str:
+    if not text.strip():
+        return text
+    messages = prompts.translator_prompt_template.format_messages(text=text)
+    return await cached_ainvoke("translate_section", model, model, messages)
+
+
+async def translate_to_portuguese(state: State):
+    # Only LLM-written sections are translated, one call per section in parallel. Each call is
+    # cached on its source text, so re-running a listing only re-translates edited sections.
+    # Key features and the call to action are already rendered in the listing's language.
+    # A neighborhood summary precomputed in Portuguese and sections rendered from templates
+    # are used as is.
+    routes = state.get("model_routes", {})
+    sections = [
+        section
+        for section in TRANSLATED_SECTIONS
+        if routes.get(SECTION_NODES[section]) != "template"
+    ]
+    stored = {}
+    location_details = state["user_input"].location_details
+    if neighborhood_store and (
+        stored_summary := neighborhood_store.get(
+            location_details.neighborhood, location_details.city, "pt"
+        )
+    ):
+        stored["neighborhood_summary"] = stored_summary
+        sections = [section for section in sections if section not in stored]
+    model = route("translate_to_portuguese", "translator")
+    translations = await asyncio.gather(
+        *(translate_section(state[section], model) for section in sections)
+    )
+    return {
+        **dict(zip(sections, translations)),
+        **stored,
+        **routed("translate_to_portuguese", model),
+    }
 
 
 def should_translate(state: State):
@@ -34,153 +219,428 @@ def should_translate(state: State):
     return END
 
 
-def generate_title(state: State):
+async def generate_title(state: State):
+    templated = listing_templates.title(state["user_input"])
+    model = route("generate_title", "mini", template=templated is not None)
+    if model is None:
+        return {"title": templated, **routed("generate_title", model)}
+
     user_title = state["user_input"].title
     bedrooms = state["user_input"].property_features.bedrooms
     neighborhood = state["user_input"].location_details.neighborhood
     city = state["user_input"].location_details.city
 
-    title_generator_prompt_template = ChatPromptTemplate(
-        [
-            ("system", prompts.title_generator_system_prompt),
-            ("human", prompts.title_generator_user_prompt),
-        ]
-    )
-
-    messages = title_generator_prompt_template.format_messages(
+    messages = prompts.title_generator_prompt_template.format_messages(
         title=user_title,
         bedrooms=bedrooms,
         neighborhood=neighborhood,
         city=city,
     )
-    return {"title": llm_mini.invoke(messages).content}
+    title = await cached_ainvoke("generate_title", model, model, messages)
+    return {"title": title, **routed("generate_title", model)}
 
 
-def generate_adjectives(state: State):
-    adjective_generator = llm.with_structured_output(PropertyAdjectives)
+async def generate_adjectives(state: State):
     user_input = state["user_input"]
-    messages = ChatPromptTemplate(
-        [
-            ("system", prompts.adjective_generator_system_prompt),
-            ("human", user_input.build_features_paragraph()),
-        ]
-    ).format_messages()
-    response = adjective_generator.invoke(messages)
+    messages = prompts.adjective_generator_prompt_template.format_messages(
+        features=user_input.build_features_paragraph()
+    )
+    model = route("generate_adjectives", "main")
+    response = await cached_ainvoke(
+        "generate_adjectives",
+        model,
+        structured_model(model, PropertyAdjectives),
+        messages,
+        PropertyAdjectives,
+    )
 
-    return {"adjectives": response}
+    return {"adjectives": response, **routed("generate_adjectives", model)}
 
 
-def generate_full_description(state: State):
-    messages = ChatPromptTemplate(
-        [
-            ("system", prompts.full_description_system_prompt),
-            ("human", prompts.generate_full_description_user_prompt(state)),
-        ]
-    ).format_messages()
-    full_description = llm.invoke(messages).content
-    return {"full_description": full_description}
+async def generate_full_description(state: State):
+    messages = prompts.full_description_prompt_template.format_messages(
+        description_input=prompts.full_description_user_prompt(state)
+    )
+    model = route("generate_full_description", "main")
+    full_description = await cached_ainvoke(
+        "generate_full_description", model, model, messages
+    )
+    return {"full_description": full_description, **routed("generate_full_description", model)}
 
 
-def generate_neigborhood_summary(state: State):
+async def generate_neigborhood_summary(state: State):
     location_details = state["user_input"].location_details
+    if neighborhood_store and (
+        stored_summary := neighborhood_store.get(
+            location_details.neighborhood, location_details.city
+        )
+    ):
+        return {"neighborhood_summary": stored_summary}
+
     neighborhood = f"{location_details.neighborhood}, {location_details.city}"
-    messages = ChatPromptTemplate(
-        [
-            ("system", prompts.neighborhood_summary_generator_system_prompt),
-            ("human", neighborhood),
-        ]
-    ).format_messages()
-    neighborhood_summary = llm.invoke(messages).content
+    messages = prompts.neighborhood_summary_prompt_template.format_messages(
+        neighborhood=neighborhood
+    )
+    model = route("generate_neigborhood_summary", "main")
+    neighborhood_summary = await cached_ainvoke(
+        "generate_neigborhood_summary", model, model, messages
+    )
+
+    return {
+        "neighborhood_summary": neighborhood_summary,
+        **routed("generate_neigborhood_summary", model),
+    }
 
-    return {"neighborhood_summary": neighborhood_summary}
 
+async def generate_headline(state: State):
+    templated = listing_templates.headline(state["user_input"])
+    model = route("generate_headline", "mini", template=templated is not None)
+    if model is None:
+        return {"headline": templated, **routed("generate_headline", model)}
 
-def generate_headline(state: State):
-    features = state["adjectives"].all_adjectives_list
     title = state["title"]
-    messages = ChatPromptTemplate(
-        [
-            ("system", prompts.headline_system_prompt),
-            ("human", prompts.headline_user_prompt),
-        ]
-    ).format_messages(title=title, features=features)
-    headline = llm_mini.invoke(messages).content
+    messages = prompts.headline_prompt_template.format_messages(
+        title=title, features=prompts.headline_features(state)
+    )
+    headline = await cached_ainvoke("generate_headline", model, model, messages)
 
-    return {"headline": headline}
+    return {"headline": headline, **routed("generate_headline", model)}
 
 
-def generate_meta_description(state: State):
-    messages = ChatPromptTemplate(
-        [
-            ("system", prompts.meta_description_system_prompt),
-            ("human", prompts.generate_full_description_user_prompt(state)),
-        ]
-    ).format_messages()
-    meta_description = llm.invoke(messages).content
-    return {"meta_description": meta_description}
+async def generate_meta_description(state: State):
+    templated = listing_templates.meta_description(state["user_input"])
+    model = route("generate_meta_description", "main", template=templated is not None)
+    if model is None:
+        return {"meta_description": templated, **routed("generate_meta_description", model)}
+
+    messages = prompts.meta_description_prompt_template.format_messages(
+        description_input=prompts.meta_description_user_prompt(state)
+    )
+    meta_description = await cached_ainvoke(
+        "generate_meta_description", model, model, messages
+    )
+    return {"meta_description": meta_description, **routed("generate_meta_description", model)}
 
 
-def add_key_features(state: State):
+async def add_key_features(state: State):
     key_features = state["user_input"].key_features_list
     return {"key_features_list": key_features}
 
 
-def add_call_to_action(state: State):
-    city = state["user_input"].location_details.city
+async def add_call_to_action(state: State):
+    return {"call_to_action": state["user_input"].call_to_action()}
+
+
+async def generate_listing_draft(state: State):
+    user_input = state["user_input"]
+    messages = prompts.single_shot_prompt_template.format_messages(
+        features=user_input.build_features_paragraph()
+    )
+    model = route("generate_listing_draft", "main")
+    draft = await cached_ainvoke(
+        "generate_listing_draft",
+        model,
+        structured_model(model, ListingDraft),
+        messages,
+        ListingDraft,
+    )
     return {
-        "call_to_action": f"Don’t miss this opportunity—schedule your viewing today and discover your new home in {city}."
+        **draft.model_dump(exclude={"adjectives"}),
+        "adjectives": draft.adjectives,
+        **routed("generate_listing_draft", model),
     }
 
 
-def invoke_graph(user_input: UserInput) -> OutputState:
+NODE_DEPENDENCIES: dict[str, list[str]] = {
+    "generate_title": [],
+    "generate_adjectives": [],
+    "generate_neigborhood_summary": [],
+    "add_key_features": [],
+    "add_call_to_action": [],
+    "generate_headline": ["generate_title", "generate_adjectives"],
+    "generate_full_description": [
+        "generate_adjectives",
+        "generate_neigborhood_summary",
+    ],
+    # Summarizes the full description rather than rebuilding it from the same inputs.
+    "generate_meta_description": ["generate_full_description"],
+}
+
+SINGLE_SHOT_DEPENDENCIES: dict[str, list[str]] = {
+    "generate_listing_draft": [],
+    "add_key_features": [],
+    "add_call_to_action": [],
+}
+
+PIPELINE_DEPENDENCIES: dict[PipelineMode, dict[str, list[str]]] = {
+    "graph": NODE_DEPENDENCIES,
+    "single_shot": SINGLE_SHOT_DEPENDENCIES,
+    # Same nodes, with title, headline and meta description rendered from templates.
+    "fast": NODE_DEPENDENCIES,
+}
+
+NODES = {
+    node.__name__: node
+    for node in (
+        generate_title,
+        generate_adjectives,
+        generate_full_description,
+        generate_meta_description,
+        generate_neigborhood_summary,
+        generate_headline,
+        generate_listing_draft,
+        add_key_features,
+        add_call_to_action,
+    )
+}
+
+
+def terminal_nodes(dependencies: dict[str, list[str]]) -> list[str]:
+    """Nodes no other node depends on; the translation step has to wait for all of them."""
+    return [
+        node
+        for node in dependencies
+        if not any(node in deps for deps in dependencies.values())
+    ]
+
+
+def timed(
+    node: Callable[[State], Awaitable[dict]],
+) -> Callable[[State], Awaitable[dict]]:
+    @wraps(node)
+    async def wrapper(state: State) -> dict:
+        start = time.perf_counter()
+        update = await node(state)
+        end = time.perf_counter()
+        metrics.record_node(node.__name__, end - start)
+        return {**update, "node_timings": {node.__name__: (start, end)}}
+
+    return wrapper
+
+
+async def join_sections(state: State):
+    return {}
+
+
+def critical_path(
+    node_timings: dict[str, tuple[float, float]],
+    dependencies: dict[str, list[str]] = NODE_DEPENDENCIES,
+) -> list[str]:
+    """Walk back from the last node to finish, following the dependency that finished last."""
+    terminals = terminal_nodes(dependencies)
+    path = []
+    candidates = list(node_timings)
+    while candidates:
+        node = max(candidates, key=lambda name: node_timings[name][1])
+        path.append(node)
+        candidates = [
+            dep for dep in dependencies.get(node, terminals) if dep in node_timings
+        ]
+    return path[::-1]
+
+
+def format_timing_breakdown(
+    node_timings: dict[str, tuple[float, float]],
+    dependencies: dict[str, list[str]] = NODE_DEPENDENCIES,
+) -> str:
+    origin = min(start for start, _ in node_timings.values())
+    on_critical_path = set(critical_path(node_timings, dependencies))
+    lines = []
+    # Timings restored from a checkpoint come back as lists rather than tuples.
+    for node, (start, end) in sorted(node_timings.items(), key=lambda item: tuple(item[1])):
+        marker = "*" if node in on_critical_path else " "
+        lines.append(
+            f"{marker} {node:<30} {start - origin:7.3f}s -> {end - origin:7.3f}s ({end - start:.3f}s)"
+        )
+    return "\n".join(lines)
+
+
+def build_graph_builder(mode: PipelineMode = "graph") -> StateGraph:
+    dependencies = PIPELINE_DEPENDENCIES[mode]
     builder = StateGraph(State)
-    builder.add_node(generate_title)
-    builder.add_node(generate_adjectives)
-    builder.add_node(generate_full_description)
-    builder.add_node(generate_meta_description)
-    builder.add_node(generate_neigborhood_summary)
-    builder.add_node(generate_headline)
-    builder.add_node(add_key_features)
-    builder.add_node(add_call_to_action)
-    builder.add_node(translate_to_portuguese)
-
-    builder.add_edge(START, "generate_title")
-    builder.add_edge("generate_title", "generate_adjectives")
-    builder.add_edge("generate_adjectives", "generate_neigborhood_summary")
-    builder.add_edge("generate_neigborhood_summary", "generate_headline")
-    builder.add_edge("generate_headline", "generate_full_description")
-    builder.add_edge("generate_full_description", "generate_meta_description")
-    builder.add_edge("generate_meta_description", "add_key_features")
-    builder.add_edge("add_key_features", "add_call_to_action")
-    builder.add_conditional_edges("add_call_to_action", should_translate)
+    for node in dependencies:
+        builder.add_node(timed(NODES[node]))
+    builder.add_node(timed(translate_to_portuguese))
+    builder.add_node(join_sections)
+
+    # Independent nodes fan out from START in the same superstep, and each join only
+    # waits on the nodes it actually reads from.
+    for node, node_dependencies in dependencies.items():
+        if not node_dependencies:
+            builder.add_edge(START, node)
+        elif len(node_dependencies) == 1:
+            builder.add_edge(node_dependencies[0], node)
+        else:
+            builder.add_edge(node_dependencies, node)
+    builder.add_edge(terminal_nodes(dependencies), "join_sections")
+    builder.add_conditional_edges("join_sections", should_translate)
     builder.add_edge("translate_to_portuguese", END)
+    return builder
+
+
+_graphs: dict[PipelineMode, CompiledStateGraph] = {}
+_graph_lock = threading.Lock()
+
+
+def compile_graph(
+    mode: PipelineMode = "graph", checkpointer: BaseCheckpointSaver | None = None
+) -> CompiledStateGraph:
+    # The checkpointer keeps each superstep's completed node outputs, so a run that fails
+    # can be resumed without redoing them.
+    return build_graph_builder(mode).compile(checkpointer=checkpointer or InMemorySaver())
+
+
+def get_graph(mode: PipelineMode = "graph") -> CompiledStateGraph:
+    """Return the compiled graph for `mode`, compiling it on first use."""
+    if mode not in _graphs:
+        with _graph_lock:
+            if mode not in _graphs:
+                _graphs[mode] = compile_graph(mode)
+    return _graphs[mode]
+
+
+# How many times a run whose node failed after exhausting its retries is resumed from its
+# last checkpoint.
+GRAPH_RESUME_ATTEMPTS = 1
+
 
-    graph = builder.compile()
-
-    # input_state = {
-    #     "user_input": UserInput.from_dict(
-    #         {
-    #             "title": "T3 apartment in Madrid",
-    #             "features": {
-    #                 "bedrooms": 1,
-    #                 "bathrooms": 1,
-    #                 "area_sqm": 35,
-    #                 "year_built": 2000,
-    #                 "balcony": False,
-    #                 "parking": False,
-    #                 "elevator": True,
-    #                 "floor": 3,
-    #             },
-    #             "location": {
-    #                 "city": "Madrid",
-    #                 "neighborhood": "Lavapies",
-    #             },
-    #             "language": "pt",
-    #             "price": 5000,
-    #             "listing_type": "rent",
-    #         }
-    #     )
-    # }
-    result = graph.invoke({"user_input": user_input})
+def run_config(bypass_cache: bool, mode: PipelineMode, thread_id: str | None = None) -> dict:
+    return {
+        "configurable": {
+            "bypass_cache": bypass_cache,
+            "mode": mode,
+            "thread_id": thread_id or uuid.uuid4().hex,
+        }
+    }
+
+
+async def ainvoke_with_resume(graph: CompiledStateGraph, graph_input: dict, config: dict) -> dict:
+    """Run the graph, resuming from its checkpoint if a node fails with a retryable error."""
+    try:
+        for attempt in range(GRAPH_RESUME_ATTEMPTS + 1):
+            try:
+                return await graph.ainvoke(graph_input if attempt == 0 else None, config)
+            except llm_client.RETRYABLE_ERRORS as error:
+                if attempt == GRAPH_RESUME_ATTEMPTS:
+                    raise
+                logger.warning("Resuming listing after a failed node: %r", error)
+                await asyncio.sleep(llm_client.DEFAULT_POLICY.backoff(attempt))
+    finally:
+        await graph.checkpointer.adelete_thread(config["configurable"]["thread_id"])
+
+
+# Nodes whose LLM output is forwarded token by token when streaming, and the section they fill.
+STREAMED_SECTIONS = {
+    "generate_full_description": "full_description",
+    "generate_neigborhood_summary": "neighborhood_summary",
+}
+
+
+def use_models(
+    main_model: BaseChatModel,
+    mini_model: BaseChatModel,
+    translation_model: BaseChatModel,
+):
+    """Swap the chat models used by the nodes, e.g. for a local fake backend."""
+    global llm, llm_mini, translator
+    llm = main_model
+    llm_mini = mini_model
+    translator = translation_model
+    _structured_models.clear()
+
+
+def invoke_graph(
+    user_input: UserInput, bypass_cache: bool = False, mode: PipelineMode = "graph"
+) -> OutputState:
+    return asyncio.run(ainvoke_graph(user_input, bypass_cache, mode))
+
+
+async def ainvoke_graph(
+    user_input: UserInput, bypass_cache: bool = False, mode: PipelineMode = "graph"
+) -> OutputState:
+    """Generate a listing; concurrent calls with an identical input, mode and bypass_cache
+    share a single graph run.
+    """
+    key = (
+        hashlib.sha256(user_input.model_dump_json().encode()).hexdigest(),
+        mode,
+        bypass_cache,
+    )
+    output_state, shared = await listing_flights.do(
+        key, lambda: _ainvoke_graph(user_input, bypass_cache, mode)
+    )
+    if shared:
+        metrics.graph_coalesced.inc(mode)
+    return output_state
+
+
+async def _ainvoke_graph(
+    user_input: UserInput, bypass_cache: bool, mode: PipelineMode
+) -> OutputState:
+    return await run_graph(
+        get_graph(mode), {"user_input": user_input}, run_config(bypass_cache, mode)
+    )
+
+
+async def run_graph(
+    graph: CompiledStateGraph, graph_input: dict | None, config: dict
+) -> OutputState:
+    """Run `graph` on the thread in `config`; a `graph_input` of None continues the thread
+    from its last checkpoint.
+    """
+    mode = config["configurable"]["mode"]
+    start = time.perf_counter()
+    with router.track_listing():
+        result = await ainvoke_with_resume(graph, graph_input, config)
+    metrics.graph_duration.observe(time.perf_counter() - start, mode)
+    logger.info(
+        "Node timings (* = critical path):\n%s",
+        format_timing_breakdown(result["node_timings"], PIPELINE_DEPENDENCIES[mode]),
+    )
     output_state = OutputState(**result)
     return output_state
+
+
+async def astream_graph(
+    user_input: UserInput, bypass_cache: bool = False, mode: PipelineMode = "graph"
+) -> AsyncIterator[tuple[str, dict]]:
+    """Run the graph and yield `(event, payload)` pairs as the listing is produced.
+
+    Events are "token" (a text delta for one of STREAMED_SECTIONS), "section" (a finished
+    section, re-sent when it is translated) and a final "done" with the whole listing.
+    """
+    graph = get_graph(mode)
+    start = time.perf_counter()
+    state = {"user_input": user_input, "node_timings": {}, "model_routes": {}}
+    config = run_config(bypass_cache, mode)
+    try:
+        with router.track_listing():
+            async for stream_mode, chunk in graph.astream(
+                {"user_input": user_input}, config, stream_mode=["messages", "updates"]
+            ):
+                if stream_mode == "messages":
+                    message, metadata = chunk
+                    section = STREAMED_SECTIONS.get(metadata.get("langgraph_node"))
+                    if section and message.content:
+                        yield "token", {"section": section, "delta": message.content}
+                    continue
+                for update in chunk.values():
+                    if not update:
+                        continue
+                    for key, value in update.items():
+                        if key in ("node_timings", "model_routes"):
+                            state[key] |= value
+                        else:
+                            state[key] = value
+                            if key in OutputState.model_fields:
+                                yield "section", {"section": key, "content": value}
+    finally:
+        await graph.checkpointer.adelete_thread(config["configurable"]["thread_id"])
+
+    metrics.graph_duration.observe(time.perf_counter() - start, mode)
+    logger.info(
+        "Node timings (* = critical path):\n%s",
+        format_timing_breakdown(state["node_timings"], PIPELINE_DEPENDENCIES[mode]),
+    )
+    output_state = OutputState(**state)
+    yield "done", {"output": output_state.model_dump(), "html": output_state.to_html(user_input)}
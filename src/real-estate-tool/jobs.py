@@ -0,0 +1,318 @@
+"""Durable listing generation jobs.
+
+The API submits jobs to a SQLite queue and returns at once; a pool of worker processes
+claims them and runs the graph. A claimed job holds a lease that its worker keeps renewing,
+so the job of a worker that dies is picked up again once the lease expires. Graph state is
+checkpointed to SQLite per job, and the new worker continues from the last completed
+superstep instead of repeating its LLM calls.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import logging
+import multiprocessing
+import os
+import signal
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Literal, get_args
+
+from dotenv import load_dotenv
+from graph import compile_graph, run_config, run_graph
+from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+from langgraph.graph.state import CompiledStateGraph
+from models import OutputState, PipelineMode, UserInput
+from pydantic import BaseModel
+
+logger = logging.getLogger(__name__)
+
+JobStatus = Literal["queued", "running", "done", "failed"]
+
+load_dotenv()
+DEFAULT_QUEUE_PATH = os.getenv("JOB_QUEUE_PATH", "jobs.sqlite3")
+DEFAULT_CHECKPOINT_PATH = os.getenv("JOB_CHECKPOINT_PATH", "checkpoints.sqlite3")
+# Seconds a claimed job stays with its worker without a renewal.
+LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", "30"))
+RENEW_INTERVAL = LEASE_SECONDS / 3
+POLL_INTERVAL = 0.5
+# Claims after which a job that keeps losing its worker is failed instead of retried.
+MAX_JOB_ATTEMPTS = 3
+
+
+class Job(BaseModel):
+    id: str
+    status: JobStatus
+    user_input: UserInput
+    mode: PipelineMode
+    bypass_cache: bool
+    output: OutputState | None = None
+    error: str | None = None
+    attempts: int
+    created_at: float
+    updated_at: float
+
+
+_COLUMNS = (
+    "id, status, input, mode, bypass_cache, output, error, attempts, created_at, updated_at"
+)
+
+
+def _job_from_row(row: tuple) -> Job:
+    id_, status, input_, mode, bypass_cache, output, error, attempts, created_at, updated_at = row
+    return Job(
+        id=id_,
+        status=status,
+        user_input=UserInput.model_validate_json(input_),
+        mode=mode,
+        bypass_cache=bool(bypass_cache),
+        output=OutputState.model_validate_json(output) if output else None,
+        error=error,
+        attempts=attempts,
+        created_at=created_at,
+        updated_at=updated_at,
+    )
+
+
+class JobQueue:
+    """Jobs persisted in SQLite, safe to share between the API and worker processes."""
+
+    def __init__(self, path: str):
+        # Autocommit, so that claiming can take the write lock with BEGIN IMMEDIATE.
+        self._connection = sqlite3.connect(
+            path, check_same_thread=False, isolation_level=None, timeout=30.0
+        )
+        self._lock = threading.Lock()
+        with self._lock:
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                "id TEXT PRIMARY KEY, status TEXT NOT NULL, input TEXT NOT NULL, "
+                "mode TEXT NOT NULL, bypass_cache INTEGER NOT NULL, output TEXT, error TEXT, "
+                "attempts INTEGER NOT NULL DEFAULT 0, worker TEXT, lease_expires_at REAL, "
+                "created_at REAL NOT NULL, updated_at REAL NOT NULL)"
+            )
+            self._connection.execute(
+                "CREATE INDEX IF NOT EXISTS jobs_by_status ON jobs (status, created_at)"
+            )
+
+    def submit(
+        self, user_input: UserInput, mode: PipelineMode = "graph", bypass_cache: bool = False
+    ) -> Job:
+        now = time.time()
+        job = Job(
+            id=uuid.uuid4().hex,
+            status="queued",
+            user_input=user_input,
+            mode=mode,
+            bypass_cache=bypass_cache,
+            attempts=0,
+            created_at=now,
+            updated_at=now,
+        )
+        with self._lock:
+            self._connection.execute(
+                "INSERT INTO jobs (id, status, input, mode, bypass_cache, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (job.id, job.status, user_input.model_dump_json(), mode, bypass_cache, now, now),
+            )
+        return job
+
+    def get(self, job_id: str) -> Job | None:
+        with self._lock:
+            row = self._connection.execute(
+                f"SELECT {_COLUMNS} FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+        return _job_from_row(row) if row else None
+
+    def claim(self, worker: str, lease: float = LEASE_SECONDS) -> Job | None:
+        """Take the oldest queued job, or a running one whose worker's lease has expired."""
+        with self._lock:
+            connection = self._connection
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                while True:
+                    now = time.time()
+                    row = connection.execute(
+                        "SELECT id, attempts FROM jobs WHERE status = 'queued' "
+                        "OR (status = 'running' AND lease_expires_at < ?) "
+                        "ORDER BY created_at LIMIT 1",
+                        (now,),
+                    ).fetchone()
+                    if row is None:
+                        connection.execute("COMMIT")
+                        return None
+                    job_id, attempts = row
+                    if attempts < MAX_JOB_ATTEMPTS:
+                        break
+                    connection.execute(
+                        "UPDATE jobs SET status = 'failed', error = ?, worker = NULL, "
+                        "updated_at = ? WHERE id = ?",
+                        (f"Worker lost {attempts} times", now, job_id),
+                    )
+                connection.execute(
+                    "UPDATE jobs SET status = 'running', attempts = attempts + 1, worker = ?, "
+                    "lease_expires_at = ?, updated_at = ? WHERE id = ?",
+                    (worker, now + lease, now, job_id),
+                )
+                row = connection.execute(
+                    f"SELECT {_COLUMNS} FROM jobs WHERE id = ?", (job_id,)
+                ).fetchone()
+                connection.execute("COMMIT")
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+        return _job_from_row(row)
+
+    def _update_owned(self, job_id: str, worker: str, assignments: str, values: tuple) -> bool:
+        # A worker only updates jobs it still holds; once its lease has been taken over, the
+        # new worker owns the result.
+        with self._lock:
+            cursor = self._connection.execute(
+                f"UPDATE jobs SET {assignments} WHERE id = ? AND worker = ? AND status = 'running'",
+                (*values, job_id, worker),
+            )
+        return cursor.rowcount == 1
+
+    def renew(self, job_id: str, worker: str, lease: float = LEASE_SECONDS) -> bool:
+        return self._update_owned(job_id, worker, "lease_expires_at = ?", (time.time() + lease,))
+
+    def complete(self, job_id: str, worker: str, output: OutputState) -> bool:
+        return self._update_owned(
+            job_id,
+            worker,
+            "status = 'done', output = ?, updated_at = ?",
+            (output.model_dump_json(), time.time()),
+        )
+
+    def fail(self, job_id: str, worker: str, error: str) -> bool:
+        return self._update_owned(
+            job_id, worker, "status = 'failed', error = ?, updated_at = ?", (error, time.time())
+        )
+
+    def counts(self) -> dict[JobStatus, int]:
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT status, COUNT(*) FROM jobs GROUP BY status"
+            ).fetchall()
+        return {status: 0 for status in get_args(JobStatus)} | dict(rows)
+
+
+class Worker:
+    """Claims jobs from `queue` and runs up to `concurrency` of them at a time."""
+
+    def __init__(self, queue: JobQueue, checkpoint_path: str, concurrency: int = 8):
+        self.queue = queue
+        self.checkpoint_path = checkpoint_path
+        self.concurrency = concurrency
+        self.id = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+
+    async def run(self, stop: asyncio.Event | None = None):
+        stop = stop or asyncio.Event()
+        slots = asyncio.Semaphore(self.concurrency)
+        tasks = set()
+        async with AsyncSqliteSaver.from_conn_string(self.checkpoint_path) as checkpointer:
+            graphs: dict[PipelineMode, CompiledStateGraph] = {}
+            while not stop.is_set():
+                await slots.acquire()
+                job = await asyncio.to_thread(self.queue.claim, self.id)
+                if job is None:
+                    slots.release()
+                    try:
+                        await asyncio.wait_for(stop.wait(), POLL_INTERVAL)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+                if job.mode not in graphs:
+                    graphs[job.mode] = compile_graph(job.mode, checkpointer)
+                task = asyncio.create_task(self.process(job, graphs[job.mode]))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+                task.add_done_callback(lambda _: slots.release())
+            await asyncio.gather(*tasks)
+
+    async def process(self, job: Job, graph: CompiledStateGraph):
+        config = run_config(job.bypass_cache, job.mode, thread_id=job.id)
+        # The thread only has a checkpoint if a previous worker died while running this job.
+        resumed = bool((await graph.aget_state(config)).values)
+        if resumed:
+            logger.info("Resuming job %s from its last checkpoint", job.id)
+        renewal = asyncio.create_task(self._renew_lease(job.id))
+        try:
+            output = await run_graph(
+                graph, None if resumed else {"user_input": job.user_input}, config
+            )
+        except Exception as error:
+            logger.exception("Job %s failed", job.id)
+            await asyncio.to_thread(self.queue.fail, job.id, self.id, repr(error))
+        else:
+            await asyncio.to_thread(self.queue.complete, job.id, self.id, output)
+        finally:
+            renewal.cancel()
+
+    async def _renew_lease(self, job_id: str):
+        while True:
+            await asyncio.sleep(RENEW_INTERVAL)
+            if not await asyncio.to_thread(self.queue.renew, job_id, self.id):
+                logger.warning("Lost the lease on job %s", job_id)
+                return
+
+
+def _worker_process(queue_path: str, checkpoint_path: str, concurrency: int):
+    logging.basicConfig(level=logging.INFO)
+    worker = Worker(JobQueue(queue_path), checkpoint_path, concurrency)
+    try:
+        asyncio.run(worker.run())
+    except KeyboardInterrupt:
+        pass
+
+
+def run_workers(processes: int, queue_path: str, checkpoint_path: str, concurrency: int):
+    """Run `processes` worker processes, restarting any that exit."""
+    context = multiprocessing.get_context("spawn")
+    arguments = (queue_path, checkpoint_path, concurrency)
+
+    def start():
+        process = context.Process(target=_worker_process, args=arguments, daemon=True)
+        process.start()
+        return process
+
+    workers = [start() for _ in range(processes)]
+    try:
+        while True:
+            for index, process in enumerate(workers):
+                process.join(timeout=1.0 / processes)
+                if not process.is_alive():
+                    logger.warning(
+                        "Worker %s exited with %s, restarting", process.pid, process.exitcode
+                    )
+                    workers[index] = start()
+    except KeyboardInterrupt:
+        for process in workers:
+            process.terminate()
+        for process in workers:
+            process.join()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run listing generation workers")
+    parser.add_argument("-p", "--processes", type=int, default=os.cpu_count() or 1)
+    parser.add_argument(
+        "-c", "--concurrency", type=int, default=8, help="Jobs run at once by each process"
+    )
+    parser.add_argument("--queue", default=DEFAULT_QUEUE_PATH)
+    parser.add_argument("--checkpoints", default=DEFAULT_CHECKPOINT_PATH)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    # Stop the workers on SIGTERM as on Ctrl-C; their running jobs are resumed elsewhere.
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    # Create the tables once, before the workers race to.
+    JobQueue(args.queue)
+    run_workers(args.processes, args.queue, args.checkpoints, args.concurrency)
+
+
+if __name__ == "__main__":
+    main()
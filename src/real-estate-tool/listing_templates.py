@@ -0,0 +1,127 @@
+"""Rule-based title, headline and meta description, rendered directly in the listing's
+language. Each function returns None when the input is not enough for a good result, in which
+case the section is left to the LLM.
+"""
+
+import re
+
+from locales import LOCALES
+from models import UserInput
+
+META_DESCRIPTION_MAX_LENGTH = 155
+
+# Words in the user's title that identify the property type, checked in order so that e.g.
+# "studio apartment" is a studio and "penthouse apartment" a penthouse.
+PROPERTY_TYPE_KEYWORDS: dict[str, tuple[str, ...]] = {
+    "studio": ("studio", "estúdio", "estudio"),
+    "penthouse": ("penthouse", "cobertura"),
+    "duplex": ("duplex",),
+    "loft": ("loft",),
+    "villa": ("villa", "vivenda"),
+    "apartment": ("apartment", "apartamento", "flat", "apt", "condo", "condominium"),
+    "house": ("house", "moradia", "casa", "home", "townhouse", "cottage"),
+}
+
+
+def extract_property_type(title: str) -> str | None:
+    words = set(re.findall(r"\w+", title.casefold()))
+    for property_type, keywords in PROPERTY_TYPE_KEYWORDS.items():
+        if words.intersection(keywords):
+            return property_type
+    return None
+
+
+def property_label(user_input: UserInput) -> str | None:
+    """Property type with the locale's bedroom notation, e.g. "3BR Apartment" or "Apartamento T3"."""
+    property_type = extract_property_type(user_input.title)
+    if property_type is None:
+        return None
+    strings = LOCALES[user_input.language]
+    bedrooms = user_input.property_features.bedrooms
+    notation = ""
+    # No bedrooms (or none given) gets no notation rather than "0BR".
+    if bedrooms and property_type != "studio":
+        notation = strings["bedroom_notation"].format(bedrooms=bedrooms)
+    label = strings["property"].format(
+        notation=notation, property_type=strings[f"type_{property_type}"]
+    )
+    return label.strip()
+
+
+def format_price(user_input: UserInput) -> str:
+    strings = LOCALES[user_input.language]
+    price = f"{user_input.price:,}".replace(",", strings["thousands_separator"])
+    price = strings["price"].format(price=price)
+    return price + strings["per_month"] if user_input.listing_type == "rent" else price
+
+
+def title(user_input: UserInput) -> str | None:
+    """E.g. "3BR Apartment in Campo de Ourique, Lisbon" or "Apartamento T3 em ..."."""
+    label = property_label(user_input)
+    if label is None:
+        return None
+    location_details = user_input.location_details
+    return LOCALES[user_input.language]["title"].format(
+        property=label,
+        neighborhood=location_details.neighborhood,
+        city=location_details.city,
+    )
+
+
+def headline(user_input: UserInput, max_features: int = 2) -> str | None:
+    """The title followed by up to `max_features` stand-out features."""
+    listing_title = title(user_input)
+    if listing_title is None:
+        return None
+    strings = LOCALES[user_input.language]
+    property_features = user_input.property_features
+    features = []
+    if property_features.area_sqm:
+        features.append(strings["area_short"].format(area_sqm=property_features.area_sqm))
+    for feature in ("balcony", "parking", "elevator"):
+        if getattr(property_features, feature):
+            features.append(strings[f"{feature}_short"])
+    if not features:
+        return listing_title
+    features = features[:max_features]
+    joined = features[0] if len(features) == 1 else (
+        f"{', '.join(features[:-1])} {strings['and']} {features[-1]}"
+    )
+    return strings["headline"].format(title=listing_title, features=joined)
+
+
+def truncate(text: str, max_length: int = META_DESCRIPTION_MAX_LENGTH) -> str:
+    """Cut `text` at a word boundary so that it fits in `max_length` characters."""
+    if len(text) <= max_length:
+        return text
+    cut = text[: max_length - 1].rsplit(" ", 1)[0].rstrip(",;:–- ")
+    return cut + "…"
+
+
+def meta_description(user_input: UserInput) -> str | None:
+    """A search snippet of at most 155 characters. The keywords (property type, listing
+    type, neighborhood, city and price) come first so they survive truncation; key
+    features are added while they fit. A price of 0 means no price, as in the features
+    paragraph, and is left out.
+    """
+    label = property_label(user_input)
+    if label is None:
+        return None
+    strings = LOCALES[user_input.language]
+    location_details = user_input.location_details
+    description = strings["meta_description"].format(
+        property=label,
+        listing_type=strings[user_input.listing_type],
+        neighborhood=location_details.neighborhood,
+        city=location_details.city,
+        price=strings["price_clause"].format(price=format_price(user_input))
+        if user_input.price
+        else "",
+    )
+    # The last key feature is the location, which is already in the description.
+    for feature in user_input.key_features_list[:-1]:
+        candidate = f"{description} {feature}."
+        if len(candidate) > META_DESCRIPTION_MAX_LENGTH:
+            break
+        description = candidate
+    return truncate(description)
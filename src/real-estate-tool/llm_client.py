@@ -0,0 +1,167 @@
+from __future__ import annotations
+
+import asyncio
+import os
+import random
+import weakref
+from dataclasses import dataclass
+from typing import Awaitable, Callable, TypeVar
+
+import httpx
+import metrics
+import openai
+import rate_limit
+from dotenv import load_dotenv
+from langchain_core.messages import BaseMessage
+from tokens import count_tokens
+
+T = TypeVar("T")
+
+# Errors worth retrying; anything else (bad request, auth, parsing) fails the call at once.
+RETRYABLE_ERRORS = (
+    openai.RateLimitError,
+    openai.APITimeoutError,
+    openai.APIConnectionError,
+    openai.InternalServerError,
+    asyncio.TimeoutError,
+)
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    max_attempts: int = 4
+    base_delay: float = 0.5
+    max_delay: float = 20.0
+    # Seconds before an attempt is abandoned and counted as a timeout.
+    timeout: float = 60.0
+    # Seconds after which a duplicate request is sent if the first has not answered; the
+    # first response wins and the other request is cancelled.
+    hedge_after: float | None = None
+
+    def backoff(self, attempt: int) -> float:
+        """Exponential backoff with full jitter."""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2**attempt))
+
+
+# Nodes that are not listed use DEFAULT_POLICY. Streamed nodes (full description and
+# neighborhood summary) are not hedged, so that two responses never interleave their tokens.
+NODE_POLICIES: dict[str, RetryPolicy] = {
+    "generate_adjectives": RetryPolicy(hedge_after=10.0),
+    "generate_meta_description": RetryPolicy(hedge_after=8.0),
+    "translate_section": RetryPolicy(hedge_after=8.0),
+    "generate_listing_draft": RetryPolicy(timeout=120.0),
+}
+DEFAULT_POLICY = RetryPolicy()
+
+
+def estimate_tokens(messages: list[BaseMessage]) -> int:
+    """Prompt size, used to reserve tokens before a call."""
+    return sum(count_tokens(str(message.content)) for message in messages) + 1
+
+
+def _retry_after(error: Exception) -> float:
+    response = getattr(error, "response", None)
+    try:
+        return float(response.headers.get("retry-after", 0)) if response is not None else 0.0
+    except ValueError:
+        return 0.0
+
+
+async def _hedged(policy: RetryPolicy, attempt: Callable[[], Awaitable[T]]) -> tuple[T, bool]:
+    """Run `attempt`, starting a duplicate after `policy.hedge_after` seconds.
+
+    Returns the first successful result and whether a hedge was sent.
+    """
+    first = asyncio.ensure_future(attempt())
+    pending = {first}
+    try:
+        if policy.hedge_after is None:
+            return await first, False
+        done, _ = await asyncio.wait(pending, timeout=policy.hedge_after)
+        if done:
+            return first.result(), False
+
+        pending.add(asyncio.ensure_future(attempt()))
+        while True:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            succeeded = [task for task in done if task.exception() is None]
+            if succeeded or not pending:
+                return (succeeded or list(done))[0].result(), True
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+async def resilient_call(
+    node: str,
+    model_name: str,
+    messages: list[BaseMessage],
+    function: Callable[[], Awaitable[tuple[T, dict]]],
+) -> tuple[T, dict, int]:
+    """Call `function` (returning `(result, usage_metadata)`) under the model's rate limits,
+    with a timeout, hedging and retries with backoff as set by the node's policy.
+
+    Returns `(result, usage, retries)`.
+    """
+    policy = NODE_POLICIES.get(node, DEFAULT_POLICY)
+    reserved_tokens = estimate_tokens(messages)
+
+    async def attempt():
+        await rate_limit.acquire(model_name, reserved_tokens)
+        return await asyncio.wait_for(function(), policy.timeout)
+
+    for retries in range(policy.max_attempts):
+        try:
+            (result, usage), hedged = await _hedged(policy, attempt)
+        except RETRYABLE_ERRORS as error:
+            if retries + 1 == policy.max_attempts:
+                raise
+            await asyncio.sleep(max(policy.backoff(retries), _retry_after(error)))
+            continue
+        if hedged:
+            metrics.llm_hedges.inc(node, model_name)
+        # Settle the token reservation against what the call actually used.
+        used_tokens = usage.get("input_tokens", 0) + usage.get("output_tokens", 0)
+        rate_limit.record_tokens(model_name, used_tokens - reserved_tokens)
+        return result, usage, retries
+
+
+load_dotenv()
+MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "100"))
+
+
+class PerLoopTransport(httpx.AsyncBaseTransport):
+    """Keeps a separate connection pool for each event loop. Pooled connections belong to
+    the loop that opened them, and sync callers (`invoke_graph`) run each call in a new loop.
+    """
+
+    def __init__(self, **pool_options):
+        self._pool_options = pool_options
+        self._transports: weakref.WeakKeyDictionary[
+            asyncio.AbstractEventLoop, httpx.AsyncHTTPTransport
+        ] = weakref.WeakKeyDictionary()
+
+    def _transport(self) -> httpx.AsyncHTTPTransport:
+        loop = asyncio.get_running_loop()
+        if (transport := self._transports.get(loop)) is None:
+            transport = self._transports[loop] = httpx.AsyncHTTPTransport(**self._pool_options)
+        return transport
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        return await self._transport().handle_async_request(request)
+
+    async def aclose(self):
+        if (transport := self._transports.pop(asyncio.get_running_loop(), None)) is not None:
+            await transport.aclose()
+
+
+# One client shared by every model, so concurrent listings reuse keep-alive connections
+# instead of each client opening its own.
+http_async_client = httpx.AsyncClient(
+    transport=PerLoopTransport(
+        limits=httpx.Limits(
+            max_connections=MAX_CONNECTIONS, max_keepalive_connections=MAX_CONNECTIONS
+        )
+    ),
+    timeout=httpx.Timeout(DEFAULT_POLICY.timeout, connect=10.0),
+)
@@ -0,0 +1,76 @@
+# Strings for the sections that are built by code rather than by an LLM, so that they never
+# need to go through translation.
+LOCALES: dict[str, dict[str, str]] = {
+    "en": {
+        "area": "{area_sqm} sqm of living space",
+        "bedroom": "bedroom",
+        "bedrooms": "bedrooms",
+        "bathroom": "bathroom",
+        "bathrooms": "bathrooms",
+        "rooms": "{bedrooms} {bed_label} and {bathrooms} {bath_label}",
+        "balcony": "Private balcony",
+        "elevator": "Elevator access",
+        "parking": "Dedicated parking",
+        "location": "Located in {neighborhood}, {city}",
+        "call_to_action": "Don’t miss this opportunity—schedule your viewing today and discover your new home in {city}.",
+        "bedroom_notation": "{bedrooms}BR",
+        "property": "{notation} {property_type}",
+        "title": "{property} in {neighborhood}, {city}",
+        "headline": "{title} with {features}",
+        "and": "and",
+        "meta_description": "{property} for {listing_type} in {neighborhood}, {city}{price}.",
+        "price_clause": " – {price}",
+        "sale": "sale",
+        "rent": "rent",
+        "price": "€{price}",
+        "per_month": "/month",
+        "thousands_separator": ",",
+        "area_short": "{area_sqm} sqm",
+        "balcony_short": "balcony",
+        "parking_short": "parking",
+        "elevator_short": "elevator",
+        "type_apartment": "Apartment",
+        "type_house": "House",
+        "type_villa": "Villa",
+        "type_studio": "Studio",
+        "type_penthouse": "Penthouse",
+        "type_duplex": "Duplex",
+        "type_loft": "Loft",
+    },
+    "pt": {
+        "area": "{area_sqm} m² de área útil",
+        "bedroom": "quarto",
+        "bedrooms": "quartos",
+        "bathroom": "casa de banho",
+        "bathrooms": "casas de banho",
+        "rooms": "{bedrooms} {bed_label} e {bathrooms} {bath_label}",
+        "balcony": "Varanda privativa",
+        "elevator": "Acesso por elevador",
+        "parking": "Estacionamento próprio",
+        "location": "Localizado em {neighborhood}, {city}",
+        "call_to_action": "Não perca esta oportunidade — agende já a sua visita e descubra a sua nova casa em {city}.",
+        "bedroom_notation": "T{bedrooms}",
+        "property": "{property_type} {notation}",
+        "title": "{property} em {neighborhood}, {city}",
+        "headline": "{title} com {features}",
+        "and": "e",
+        "meta_description": "{property} para {listing_type} em {neighborhood}, {city}{price}.",
+        "price_clause": " – {price}",
+        "sale": "venda",
+        "rent": "arrendamento",
+        "price": "{price} €",
+        "per_month": "/mês",
+        "thousands_separator": ".",
+        "area_short": "{area_sqm} m²",
+        "balcony_short": "varanda",
+        "parking_short": "estacionamento",
+        "elevator_short": "elevador",
+        "type_apartment": "Apartamento",
+        "type_house": "Moradia",
+        "type_villa": "Vivenda",
+        "type_studio": "Estúdio",
+        "type_penthouse": "Penthouse",
+        "type_duplex": "Duplex",
+        "type_loft": "Loft",
+    },
+}
@@ -1,26 +1,200 @@
+import asyncio
+import functools
+import json
+import os
+
 import uvicorn
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException
 from fastapi import Request
-from fastapi.responses import HTMLResponse
+from fastapi.responses import (
+    HTMLResponse,
+    JSONResponse,
+    PlainTextResponse,
+    Response,
+    StreamingResponse,
+)
 
-from graph import invoke_graph
-from models import UserInput
+import metrics
+from batch import DEFAULT_CONCURRENCY, parse_ndjson, result_record, run_batch
+from graph import ainvoke_graph, astream_graph
+from jobs import DEFAULT_QUEUE_PATH, Job, JobQueue
+from models import PipelineMode, UserInput
+from rendering import RenderTarget, render
 
 
 app = FastAPI()
 
+# Dumping the last request/response to disk is a debugging aid; it is opt-in so that
+# concurrent requests do not contend on the same two files.
+SAVE_LAST_LISTING = os.getenv("SAVE_LAST_LISTING") == "1"
+# Upper bound on the graphs a single batch request may run at once.
+MAX_BATCH_CONCURRENCY = int(os.getenv("MAX_BATCH_CONCURRENCY", "32"))
+# Seconds between status checks while a job's events are being streamed.
+JOB_EVENTS_POLL_INTERVAL = 0.5
 
-@app.post("/generate_property_listing")
-async def generate_property_listing(request: Request):
-    data = await request.json()
-    user_input = UserInput(**data)
+
+@functools.cache
+def job_queue() -> JobQueue:
+    # Opened on first use, so that importing this module does not create the database.
+    return JobQueue(DEFAULT_QUEUE_PATH)
+
+
+def save_last_listing(user_input: UserInput, result_html: str):
     with open("input.json", "w") as file:
         file.write(user_input.model_dump_json())
-    result = invoke_graph(user_input)
-    result_html = result.to_html()
     with open("output.html", "w") as file:
         file.write(result_html)
-    return HTMLResponse(result_html)
+
+
+@app.post("/generate_property_listing")
+async def generate_property_listing(
+    request: Request,
+    bypass_cache: bool = False,
+    mode: PipelineMode = "graph",
+    trace: bool = False,
+    target: RenderTarget = "page",
+):
+    data = await request.json()
+    user_input = UserInput(**data)
+    with metrics.trace_request() as request_trace:
+        result = await ainvoke_graph(user_input, bypass_cache, mode)
+    rendered = render(result, target, user_input)
+    if SAVE_LAST_LISTING:
+        await asyncio.to_thread(save_last_listing, user_input, result.to_html(user_input))
+    # Which model (or "template") served each node, e.g. "generate_title=gpt-4o-mini".
+    headers = {
+        "X-Model-Routes": ", ".join(
+            f"{node}={model}" for node, model in sorted(result.model_routes.items())
+        )
+    }
+    if trace:
+        headers["Server-Timing"] = request_trace.server_timing()
+    if target == "json_ld":
+        return Response(rendered, media_type="application/ld+json", headers=headers)
+    return HTMLResponse(rendered, headers=headers)
+
+
+@app.post("/generate_property_listing/stream")
+async def stream_property_listing(
+    request: Request, bypass_cache: bool = False, mode: PipelineMode = "graph"
+):
+    data = await request.json()
+    user_input = UserInput(**data)
+
+    async def server_sent_events():
+        try:
+            async for event, payload in astream_graph(user_input, bypass_cache, mode):
+                yield f"event: {event}\ndata: {json.dumps(payload, ensure_ascii=False)}\n\n"
+        except Exception as error:
+            yield f"event: error\ndata: {json.dumps({'error': str(error)})}\n\n"
+
+    return StreamingResponse(
+        server_sent_events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.post("/generate_property_listings/batch")
+async def generate_property_listings_batch(
+    request: Request,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    bypass_cache: bool = False,
+    mode: PipelineMode = "graph",
+):
+    # The body is read before responding because a streaming response competes with
+    # request.stream() for ASGI receive messages; listings are still validated lazily.
+    if request.headers.get("content-type", "").startswith("application/x-ndjson"):
+        items = parse_ndjson((await request.body()).splitlines())
+    else:
+        items = await request.json()
+
+    async def stream_results():
+        async for index, user_input, result in run_batch(
+            items, min(max(1, concurrency), MAX_BATCH_CONCURRENCY), bypass_cache, mode
+        ):
+            yield json.dumps(result_record(index, result, user_input), ensure_ascii=False) + "\n"
+
+    return StreamingResponse(stream_results(), media_type="application/x-ndjson")
+
+
+@app.post("/jobs")
+async def submit_job(request: Request, bypass_cache: bool = False, mode: PipelineMode = "graph"):
+    """Queue a listing for the worker processes (`jobs.py`) and return its id at once."""
+    data = await request.json()
+    user_input = UserInput(**data)
+    job = await asyncio.to_thread(job_queue().submit, user_input, mode, bypass_cache)
+    return JSONResponse(
+        {"job_id": job.id, "status": job.status},
+        status_code=202,
+        headers={"Location": f"/jobs/{job.id}"},
+    )
+
+
+@app.get("/jobs")
+async def job_counts():
+    """Number of jobs in each status."""
+    return await asyncio.to_thread(job_queue().counts)
+
+
+async def get_job(job_id: str) -> Job:
+    job = await asyncio.to_thread(job_queue().get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+def job_status(job: Job) -> dict:
+    return job.model_dump(mode="json", exclude={"user_input"})
+
+
+@app.get("/jobs/{job_id}")
+async def poll_job(job_id: str):
+    return job_status(await get_job(job_id))
+
+
+@app.get("/jobs/{job_id}/listing")
+async def job_listing(job_id: str, target: RenderTarget = "page"):
+    job = await get_job(job_id)
+    if job.status != "done":
+        raise HTTPException(status_code=409, detail=f"Job is {job.status}")
+    rendered = render(job.output, target, job.user_input)
+    if target == "json_ld":
+        return Response(rendered, media_type="application/ld+json")
+    return HTMLResponse(rendered)
+
+
+@app.get("/jobs/{job_id}/events")
+async def subscribe_job(job_id: str):
+    """Server-sent "status" events whenever the job changes, until it is done or failed."""
+    job = await get_job(job_id)
+
+    async def server_sent_events():
+        current = job
+        last_update = None
+        while True:
+            if current.updated_at != last_update:
+                last_update = current.updated_at
+                payload = json.dumps(job_status(current), ensure_ascii=False)
+                yield f"event: status\ndata: {payload}\n\n"
+            if current.status in ("done", "failed"):
+                return
+            await asyncio.sleep(JOB_EVENTS_POLL_INTERVAL)
+            current = await asyncio.to_thread(job_queue().get, job_id)
+
+    return StreamingResponse(
+        server_sent_events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    return PlainTextResponse(
+        metrics.render_prometheus(), media_type="text/plain; version=0.0.4"
+    )
+
 
 if __name__ == "__main__":
     uvicorn.run(app, host="127.0.0.1", port=8000)
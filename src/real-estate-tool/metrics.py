@@ -0,0 +1,218 @@
+from __future__ import annotations
+
+import bisect
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Iterator
+
+from pricing import cost_usd
+
+DURATION_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(label_names: tuple[str, ...], label_values: tuple[str, ...], **extra) -> str:
+    pairs = [*zip(label_names, label_values), *extra.items()]
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str, label_names: tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = label_names
+        self._values: dict[tuple[str, ...], float] = defaultdict(float)
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values: str, amount: float = 1.0):
+        with self._lock:
+            self._values[label_values] += amount
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for label_values, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.label_names, label_values)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        label_names: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = DURATION_BUCKETS,
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = label_names
+        self.buckets = buckets
+        self._counts: dict[tuple[str, ...], list[int]] = {}
+        self._sums: dict[tuple[str, ...], float] = defaultdict(float)
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values: str):
+        with self._lock:
+            counts = self._counts.setdefault(label_values, [0] * (len(self.buckets) + 1))
+            counts[bisect.bisect_left(self.buckets, value)] += 1
+            self._sums[label_values] += value
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for label_values, counts in sorted(self._counts.items()):
+                cumulative = 0
+                for bound, count in zip((*self.buckets, "+Inf"), counts):
+                    cumulative += count
+                    labels = _format_labels(self.label_names, label_values, le=bound)
+                    lines.append(f"{self.name}_bucket{labels} {cumulative}")
+                labels = _format_labels(self.label_names, label_values)
+                lines.append(f"{self.name}_sum{labels} {self._sums[label_values]}")
+                lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+graph_duration = Histogram(
+    "listing_graph_duration_seconds", "End-to-end listing generation time.", ("mode",)
+)
+graph_coalesced = Counter(
+    "listing_graph_coalesced_total",
+    "Listing generations that joined an identical run already in flight.",
+    ("mode",),
+)
+node_duration = Histogram(
+    "listing_node_duration_seconds", "Wall time of each graph node.", ("node",)
+)
+llm_call_duration = Histogram(
+    "listing_llm_call_duration_seconds",
+    "Wall time of each LLM call, including cache lookups.",
+    ("node", "model", "cache"),
+)
+llm_calls = Counter(
+    "listing_llm_calls_total", "LLM calls by cache status.", ("node", "model", "cache")
+)
+llm_tokens = Counter(
+    "listing_llm_tokens_total", "Tokens sent to and received from models.", ("node", "model", "kind")
+)
+llm_cost = Counter(
+    "listing_llm_cost_usd_total", "Estimated spend on model calls.", ("node", "model")
+)
+model_routes = Counter(
+    "listing_model_routes_total", "Model tier chosen for each node call.", ("node", "tier")
+)
+llm_retries = Counter(
+    "listing_llm_retries_total", "Retried LLM calls.", ("node", "model")
+)
+llm_hedges = Counter(
+    "listing_llm_hedges_total", "LLM calls that sent a hedged duplicate request.", ("node", "model")
+)
+
+REGISTRY = [
+    graph_duration,
+    graph_coalesced,
+    node_duration,
+    llm_call_duration,
+    llm_calls,
+    llm_tokens,
+    llm_cost,
+    model_routes,
+    llm_retries,
+    llm_hedges,
+]
+
+
+def render_prometheus() -> str:
+    return "\n".join(line for metric in REGISTRY for line in metric.render()) + "\n"
+
+
+@dataclass
+class LLMCallRecord:
+    model: str
+    cache: str
+    prompt_tokens: int
+    completion_tokens: int
+    retries: int
+    duration: float
+
+
+@dataclass
+class NodeTrace:
+    duration: float = 0.0
+    calls: list[LLMCallRecord] = field(default_factory=list)
+
+
+class RequestTrace:
+    """Per-request record of every node and LLM call, collected while a trace is active."""
+
+    def __init__(self):
+        self.nodes: dict[str, NodeTrace] = defaultdict(NodeTrace)
+
+    def server_timing(self) -> str:
+        """Render the trace as a Server-Timing header value."""
+        entries = []
+        for node, node_trace in self.nodes.items():
+            entry = f"{node};dur={node_trace.duration * 1000:.1f}"
+            if node_trace.calls:
+                models = ",".join(sorted({call.model for call in node_trace.calls}))
+                caches = ",".join(sorted({call.cache for call in node_trace.calls}))
+                prompt_tokens = sum(call.prompt_tokens for call in node_trace.calls)
+                completion_tokens = sum(call.completion_tokens for call in node_trace.calls)
+                retries = sum(call.retries for call in node_trace.calls)
+                entry += (
+                    f';desc="model={models} cache={caches} '
+                    f'tokens={prompt_tokens}/{completion_tokens} retries={retries}"'
+                )
+            entries.append(entry)
+        return ", ".join(entries)
+
+
+current_trace: ContextVar[RequestTrace | None] = ContextVar("current_trace", default=None)
+
+
+@contextmanager
+def trace_request() -> Iterator[RequestTrace]:
+    trace = RequestTrace()
+    token = current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        current_trace.reset(token)
+
+
+def record_node(node: str, duration: float):
+    node_duration.observe(duration, node)
+    if trace := current_trace.get():
+        trace.nodes[node].duration = duration
+
+
+def record_llm_call(
+    node: str,
+    model: str,
+    cache: str,
+    usage: dict,
+    duration: float,
+    retries: int = 0,
+):
+    """Record one LLM call; `usage` is a LangChain usage_metadata dict (empty on cache hits)."""
+    prompt_tokens = usage.get("input_tokens", 0)
+    completion_tokens = usage.get("output_tokens", 0)
+    llm_call_duration.observe(duration, node, model, cache)
+    llm_calls.inc(node, model, cache)
+    llm_tokens.inc(node, model, "prompt", amount=prompt_tokens)
+    llm_tokens.inc(node, model, "completion", amount=completion_tokens)
+    llm_cost.inc(node, model, amount=cost_usd(model, prompt_tokens, completion_tokens))
+    if retries:
+        llm_retries.inc(node, model, amount=retries)
+    if trace := current_trace.get():
+        trace.nodes[node].calls.append(
+            LLMCallRecord(model, cache, prompt_tokens, completion_tokens, retries, duration)
+        )
@@ -1,15 +1,45 @@
 from __future__ import annotations
 
-from typing import Literal, TypedDict
+import itertools
+import operator
+import re
+from typing import Annotated, Literal, TypedDict
 
-from pydantic import BaseModel, Field
+from locales import LOCALES
+from pydantic import BaseModel, Field, field_validator
+
+
+# Words that stay lower-case inside a place name, as in "Campo de Ourique".
+NAME_PARTICLES = {"de", "da", "do", "das", "dos", "e"}
+_NAME_WORD = re.compile(r"[^\s-]+")
+
+
+def title_case_name(name: str) -> str:
+    """Capitalize the words of a place name that start lower-case, except for particles
+    after the first word ("campo de ourique" becomes "Campo de Ourique"); other words, such
+    as "d'Oeste" or "SoHo", are kept as they are.
+    """
+
+    def capitalize(match: re.Match) -> str:
+        word = match.group()
+        if match.start() and word in NAME_PARTICLES:
+            return word
+        prefix = word[:2] if word[:2] in ("d'", "d’") else ""
+        word = word[len(prefix) :]
+        return prefix + word[:1].upper() + word[1:]
+
+    return _NAME_WORD.sub(capitalize, name.strip())
 
 
-# TODO: City and neighborhood should be titled
 class LocationDetails(BaseModel):
     city: str
     neighborhood: str
 
+    @field_validator("city", "neighborhood")
+    @classmethod
+    def title_case(cls, value: str) -> str:
+        return title_case_name(value)
+
 
 class PropertyFeatures(BaseModel):
     bedrooms: int | None = None
@@ -44,28 +74,48 @@ class UserInput(BaseModel):
 
     @property
     def key_features_list(self) -> list[str]:
+        return self.key_features(self.language)
+
+    def key_features(self, language: str = "en") -> list[str]:
+        strings = LOCALES[language]
         key_features_list = list()
         if area_sqm := self.property_features.area_sqm:
-            key_features_list.append(f"{area_sqm} sqm of living space")
+            key_features_list.append(strings["area"].format(area_sqm=area_sqm))
         bedrooms = self.property_features.bedrooms
         bathrooms = self.property_features.bathrooms
         if bedrooms:
-            bed_label = "bedroom" if bedrooms == 1 else "bedrooms"
+            bed_label = strings["bedroom"] if bedrooms == 1 else strings["bedrooms"]
             if bathrooms:
-                bath_label = "bathroom" if bathrooms == 1 else "bathrooms"
-                key_features_list.append(f"{bedrooms} {bed_label} and {bathrooms} {bath_label}")
+                bath_label = strings["bathroom"] if bathrooms == 1 else strings["bathrooms"]
+                key_features_list.append(
+                    strings["rooms"].format(
+                        bedrooms=bedrooms,
+                        bed_label=bed_label,
+                        bathrooms=bathrooms,
+                        bath_label=bath_label,
+                    )
+                )
             else:
                 key_features_list.append(f"{bedrooms} {bed_label}")
         if self.property_features.balcony:
-            key_features_list.append("Private balcony")
+            key_features_list.append(strings["balcony"])
         if self.property_features.elevator:
-            key_features_list.append("Elevator access")
+            key_features_list.append(strings["elevator"])
         if self.property_features.parking:
-            key_features_list.append("Dedicated parking")
-        key_features_list.append(f"Located in {self.location_details.neighborhood.title()}, {self.location_details.city.title()}")
+            key_features_list.append(strings["parking"])
+        key_features_list.append(
+            strings["location"].format(
+                neighborhood=self.location_details.neighborhood,
+                city=self.location_details.city,
+            )
+        )
 
         return key_features_list
 
+    def call_to_action(self) -> str:
+        return LOCALES[self.language]["call_to_action"].format(
+            city=self.location_details.city
+        )
 
     def build_features_paragraph(self) -> str:
         property_features = self.property_features
@@ -93,7 +143,7 @@ class UserInput(BaseModel):
 
         str_description += f"The property is available for {self.listing_type}"
         if price := self.price:
-            str_description += f"at EUR {price}.\n"
+            str_description += f" at EUR {price}.\n"
         else:
             str_description += ".\n"
 
@@ -103,6 +153,27 @@ class UserInput(BaseModel):
         return str_description
 
 
+class PreparedUserInput(UserInput):
+    """A UserInput whose key features and features paragraph were built ahead of time, for a
+    whole batch at once (see columnar.py). They are not part of the input and are left out
+    when it is serialized.
+    """
+
+    prepared_key_features: list[str] = Field(exclude=True, repr=False)
+    prepared_features_paragraph: str = Field(exclude=True, repr=False)
+
+    def key_features(self, language: str = "en") -> list[str]:
+        if language != self.language:
+            return super().key_features(language)
+        return list(self.prepared_key_features)
+
+    def build_features_paragraph(self) -> str:
+        return self.prepared_features_paragraph
+
+
+_WORD = re.compile(r"\w+")
+
+
 class PropertyAdjectives(BaseModel):
     area_size: list[str] = Field(
         ...,
@@ -125,6 +196,70 @@ class PropertyAdjectives(BaseModel):
     def all_adjectives_list(self) -> list[str]:
         return self.area_size + self.year_built + self.ideal_occupants + self.amenities
 
+    def compact_list(self) -> list[str]:
+        """The adjectives without repeats, leaving out phrases that another one of the same
+        category contains (e.g. "modern" next to "modern and bright"); across categories only
+        exact repeats are left out. Categories are taken in turn, so a list cut short to fit a
+        prompt still covers each of them.
+        """
+        kept: list[str] = []
+        keys: list[tuple[int, str]] = []
+        categories = (self.area_size, self.year_built, self.ideal_occupants, self.amenities)
+        for phrases in itertools.zip_longest(*categories):
+            for category, phrase in enumerate(phrases):
+                if phrase is None:
+                    continue
+                key = f" {' '.join(_WORD.findall(phrase.casefold()))} "
+                if key.isspace() or any(
+                    key == other or (category == other_category and key in other)
+                    for other_category, other in keys
+                ):
+                    continue
+                contained = [
+                    index
+                    for index, (other_category, other) in enumerate(keys)
+                    if category == other_category and other in key
+                ]
+                if contained:
+                    # Keep the longer phrase in the place of the first shorter one.
+                    kept[contained[0]], keys[contained[0]] = phrase.strip(), (category, key)
+                    for index in reversed(contained[1:]):
+                        del kept[index], keys[index]
+                else:
+                    kept.append(phrase.strip())
+                    keys.append((category, key))
+        return kept
+
+
+class ListingDraft(BaseModel):
+    adjectives: PropertyAdjectives = Field(
+        ...,
+        description="Adjectives/phrases grounded in the property details, used when writing the other sections.",
+    )
+    title: str = Field(
+        ...,
+        description="Concise browser tab title, e.g. 'T3 Apartment in Campo de Ourique, Lisbon'.",
+    )
+    neighborhood_summary: str = Field(
+        ...,
+        description="Single-paragraph summary of the neighborhood focusing on lifestyle and area information.",
+    )
+    full_description: str = Field(
+        ...,
+        description="Compelling listing description aligned with the neighborhood summary, without repeating it.",
+    )
+    headline: str = Field(
+        ...,
+        description="The title plus a couple of the most attractive features.",
+    )
+    meta_description: str = Field(
+        ...,
+        description="SEO meta-description of at most 155 characters including location, property type and listing intent.",
+    )
+
+
+PipelineMode = Literal["graph", "single_shot", "fast"]
+
 
 class State(TypedDict):
     user_input: UserInput
@@ -136,6 +271,8 @@ class State(TypedDict):
     neighborhood_summary: str
     call_to_action: str
     adjectives: PropertyAdjectives
+    node_timings: Annotated[dict[str, tuple[float, float]], operator.or_]
+    model_routes: Annotated[dict[str, str], operator.or_]
 
 
 class OutputState(BaseModel):
@@ -146,28 +283,17 @@ class OutputState(BaseModel):
     key_features_list: list[str]
     neighborhood_summary: str
     call_to_action: str
+    model_routes: dict[str, str] = Field(default_factory=dict)
 
-    def to_html(self) -> str:
-        key_features_html = (
-            "<ul id=\"key-features\">\n  "
-            + "\n  ".join([f"<li>{feature}</li>" for feature in self.key_features_list])
-            + "\n</ul>"
-        )
-        html_str = (
-            ""
-            + f"<title>{self.title}</title>\n"
-            + f"<meta name=\"description\" content=\"{self.meta_description}\"\n"
-            + f"<h1>{self.headline}</h1>\n"
-            + f"<section_id=\"description\">\n  <p>\n{self.full_description}\n  </p>\n</section>\n"
-            + key_features_html
-            + f"<section id=\"neighborhood\">\n  <p>\n  {self.neighborhood_summary}\n  </p>\n</section>\n"
-            + f"<p class=\"call-to-action\">{self.call_to_action}</p>"
-        )
-        return html_str
+    def to_html(self, user_input: UserInput | None = None) -> str:
+        # rendering imports this module (through listing_templates), so it is imported here.
+        from rendering import render_page
 
+        return render_page(self, user_input)
 
     def to_str(self) -> str:
         output_str = ""
-        for field in self.model_fields_set:
-            output_str += f"**{field}**: {getattr(self, field)}\n\n"
+        for field in type(self).model_fields:
+            if field in self.model_fields_set and field != "model_routes":
+                output_str += f"**{field}**: {getattr(self, field)}\n\n"
         return output_str
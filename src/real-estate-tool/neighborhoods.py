@@ -0,0 +1,290 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import difflib
+import json
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+import unicodedata
+from pathlib import Path
+from typing import Iterable
+
+from dotenv import load_dotenv
+
+# How close a stored name must be to be suggested by `candidates`; lookups are always exact.
+FUZZY_CUTOFF = 0.8
+
+
+def normalize_name(name: str) -> str:
+    """Lower-case, strip accents and punctuation so that e.g. "São Bento" and "sao-bento" match."""
+    decomposed = unicodedata.normalize("NFKD", name)
+    without_accents = "".join(char for char in decomposed if not unicodedata.combining(char))
+    return " ".join(re.sub(r"[^\w]+", " ", without_accents.casefold()).split())
+
+
+def _close_matches(key: str, candidates: Iterable[str], n: int) -> list[str]:
+    return difflib.get_close_matches(key, list(candidates), n=n, cutoff=FUZZY_CUTOFF)
+
+
+class NeighborhoodStore:
+    """Precomputed neighborhood summaries per (city, neighborhood, language), persisted in
+    SQLite and served from an in-memory index.
+    """
+
+    def __init__(self, path: str):
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._connection:
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS neighborhood_summaries ("
+                "city_key TEXT NOT NULL, neighborhood_key TEXT NOT NULL, language TEXT NOT NULL, "
+                "city TEXT NOT NULL, neighborhood TEXT NOT NULL, summary TEXT NOT NULL, "
+                "source TEXT NOT NULL, updated_at REAL NOT NULL, "
+                "PRIMARY KEY (city_key, neighborhood_key, language))"
+            )
+        # city_key -> language -> neighborhood_key -> summary
+        self._index: dict[str, dict[str, dict[str, str]]] = {}
+        for city_key, neighborhood_key, language, summary in self._connection.execute(
+            "SELECT city_key, neighborhood_key, language, summary FROM neighborhood_summaries"
+        ):
+            self._index_summary(city_key, neighborhood_key, language, summary)
+
+    @classmethod
+    def open_if_exists(cls, path: str) -> NeighborhoodStore | None:
+        return cls(path) if Path(path).exists() else None
+
+    def _index_summary(self, city_key: str, neighborhood_key: str, language: str, summary: str):
+        self._index.setdefault(city_key, {}).setdefault(language, {})[neighborhood_key] = summary
+
+    def get(self, neighborhood: str, city: str, language: str = "en") -> str | None:
+        """The summary stored under exactly these names once normalized. Close names are not
+        matched: a similar name is usually a different neighborhood (e.g. "Santos" and
+        "Santo").
+        """
+        summaries = self._index.get(normalize_name(city), {}).get(language, {})
+        return summaries.get(normalize_name(neighborhood))
+
+    def candidates(
+        self, neighborhood: str, city: str, language: str = "en", n: int = 5
+    ) -> list[tuple[str, str]]:
+        """Stored `(neighborhood, city)` names close to the given ones, for reporting near
+        misses.
+        """
+        city_key = normalize_name(city)
+        if city_key in self._index:
+            city_keys = [city_key]
+        else:
+            city_keys = _close_matches(city_key, self._index, n)
+        keys = [
+            (city_key, neighborhood_key)
+            for city_key in city_keys
+            for neighborhood_key in _close_matches(
+                normalize_name(neighborhood), self._index[city_key].get(language, {}), n
+            )
+        ]
+        with self._lock:
+            return [
+                self._connection.execute(
+                    "SELECT neighborhood, city FROM neighborhood_summaries "
+                    "WHERE city_key = ? AND neighborhood_key = ? AND language = ?",
+                    (*key, language),
+                ).fetchone()
+                for key in keys[:n]
+            ]
+
+    def lookup(self, neighborhood: str, city: str, language: str) -> tuple[str, str] | None:
+        """Exact-key `(summary, source)` lookup, without fuzzy matching."""
+        with self._lock:
+            return self._connection.execute(
+                "SELECT summary, source FROM neighborhood_summaries "
+                "WHERE city_key = ? AND neighborhood_key = ? AND language = ?",
+                (normalize_name(city), normalize_name(neighborhood), language),
+            ).fetchone()
+
+    def put(self, neighborhood: str, city: str, language: str, summary: str, source: str = "llm"):
+        city_key, neighborhood_key = normalize_name(city), normalize_name(neighborhood)
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO neighborhood_summaries VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (city_key, neighborhood_key, language, city, neighborhood, summary, source, time.time()),
+            )
+            self._index_summary(city_key, neighborhood_key, language, summary)
+
+    def entries(self) -> Iterable[dict]:
+        cursor = self._connection.execute(
+            "SELECT neighborhood, city, language, summary, source FROM neighborhood_summaries "
+            "ORDER BY city_key, neighborhood_key, language"
+        )
+        for neighborhood, city, language, summary, source in cursor:
+            yield {
+                "neighborhood": neighborhood,
+                "city": city,
+                "language": language,
+                "summary": summary,
+                "source": source,
+            }
+
+
+load_dotenv()
+DEFAULT_STORE_PATH = os.getenv("NEIGHBORHOOD_STORE_PATH", "neighborhoods.sqlite3")
+
+neighborhood_store = NeighborhoodStore.open_if_exists(DEFAULT_STORE_PATH)
+
+
+def _location_of(row: dict) -> tuple[str, str]:
+    """Accept listings in either input shape, or plain {"neighborhood", "city"} rows."""
+    location = row.get("location_details") or row.get("location") or row
+    return location["neighborhood"], location["city"]
+
+
+def _needs_summary(
+    store: NeighborhoodStore, neighborhood: str, city: str, language: str, refresh: bool
+) -> bool:
+    # Summaries edited by hand are never regenerated.
+    entry = store.lookup(neighborhood, city, language)
+    return entry is None or (refresh and entry[1] == "llm")
+
+
+async def precompute(
+    store: NeighborhoodStore,
+    rows: Iterable[dict],
+    languages: list[str],
+    concurrency: int,
+    refresh: bool,
+) -> int:
+    """Generate the missing summaries for the neighborhoods of `rows`, returning how many
+    neighborhoods failed. A failure only stops its own neighborhood; a rerun retries it.
+    """
+    # graph.py imports this module, so the models are only imported once it is needed.
+    import llm_client
+    import prompts
+    from graph import llm, translator
+
+    locations = {}
+    for row in rows:
+        neighborhood, city = _location_of(row)
+        locations.setdefault((normalize_name(city), normalize_name(neighborhood)), (neighborhood, city))
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def generate(node: str, model, messages) -> str:
+        # Under the same rate limits, timeouts and retries as the graph's calls.
+        async def invoke():
+            response = await model.ainvoke(messages)
+            return response.content, response.usage_metadata or {}
+
+        model_name = getattr(model, "model_name", type(model).__name__)
+        content, _, _ = await llm_client.resilient_call(node, model_name, messages, invoke)
+        return content
+
+    async def summarize(neighborhood: str, city: str) -> bool:
+        async with semaphore:
+            try:
+                if _needs_summary(store, neighborhood, city, "en", refresh):
+                    messages = prompts.neighborhood_summary_prompt_template.format_messages(
+                        neighborhood=f"{neighborhood}, {city}"
+                    )
+                    summary = await generate("generate_neigborhood_summary", llm, messages)
+                    store.put(neighborhood, city, "en", summary)
+                summary, _ = store.lookup(neighborhood, city, "en")
+                for language in languages:
+                    if language != "en" and _needs_summary(
+                        store, neighborhood, city, language, refresh
+                    ):
+                        messages = prompts.translator_prompt_template.format_messages(text=summary)
+                        translation = await generate("translate_section", translator, messages)
+                        store.put(neighborhood, city, language, translation)
+            except Exception as error:
+                print(f"{neighborhood}, {city}: failed: {error!r}", file=sys.stderr)
+                return False
+            print(f"{neighborhood}, {city}", file=sys.stderr)
+            return True
+
+    results = await asyncio.gather(*(summarize(*location) for location in locations.values()))
+    return results.count(False)
+
+
+def main():
+    import rate_limit
+    from batch import read_listings
+
+    parser = argparse.ArgumentParser(description="Manage precomputed neighborhood summaries")
+    parser.add_argument("--store", default=DEFAULT_STORE_PATH)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    precompute_parser = subparsers.add_parser(
+        "precompute", help="Generate summaries for every neighborhood in a listings file"
+    )
+    precompute_parser.add_argument("input", help='JSON array or NDJSON of listings or {"neighborhood", "city"} rows')
+    precompute_parser.add_argument("--languages", nargs="+", default=["en", "pt"])
+    precompute_parser.add_argument("--concurrency", type=int, default=8)
+    precompute_parser.add_argument(
+        "--refresh", action="store_true", help="Regenerate LLM summaries; edited ones are kept"
+    )
+    precompute_parser.add_argument(
+        "--rate-limit",
+        default="",
+        help='Requests per minute per model, e.g. "gpt-4o=500,gpt-4o-mini=2000"',
+    )
+    precompute_parser.add_argument(
+        "--token-limit",
+        default="",
+        help='Tokens per minute per model, e.g. "gpt-4o=30000,gpt-4o-mini=200000"',
+    )
+
+    export_parser = subparsers.add_parser("export", help="Write all summaries as NDJSON for editing")
+    export_parser.add_argument("-o", "--output", default="-")
+
+    import_parser = subparsers.add_parser("import", help="Load edited summaries from NDJSON")
+    import_parser.add_argument("input")
+
+    find_parser = subparsers.add_parser(
+        "find", help="Print the summary stored for a neighborhood, or the closest stored names"
+    )
+    find_parser.add_argument("neighborhood")
+    find_parser.add_argument("city")
+    find_parser.add_argument("--language", default="en")
+
+    args = parser.parse_args()
+    store = NeighborhoodStore(args.store)
+    if args.command == "precompute":
+        rate_limit.configure_rate_limits(
+            rate_limit.parse_rate_limits(args.rate_limit),
+            rate_limit.parse_rate_limits(args.token_limit),
+        )
+        with open(args.input) as file:
+            failed = asyncio.run(
+                precompute(store, read_listings(file), args.languages, args.concurrency, args.refresh)
+            )
+        if failed:
+            raise SystemExit(f"{failed} neighborhoods failed; rerun to retry them.")
+    elif args.command == "export":
+        output_file = open(args.output, "w") if args.output != "-" else sys.stdout
+        with output_file:
+            for entry in store.entries():
+                output_file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+    elif args.command == "import":
+        with open(args.input) as file:
+            for entry in read_listings(file):
+                location = entry["neighborhood"], entry["city"], entry["language"]
+                current = store.lookup(*location)
+                if current is None or current[0] != entry["summary"]:
+                    store.put(*location, entry["summary"], source="edited")
+    elif args.command == "find":
+        summary = store.get(args.neighborhood, args.city, args.language)
+        if summary is not None:
+            print(summary)
+            return
+        print(f"No summary for {args.neighborhood}, {args.city} ({args.language})", file=sys.stderr)
+        for neighborhood, city in store.candidates(args.neighborhood, args.city, args.language):
+            print(f"  did you mean: {neighborhood}, {city}", file=sys.stderr)
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,18 @@
+# USD per million (input, output) tokens.
+MODEL_PRICES: dict[str, tuple[float, float]] = {
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4o": (2.50, 10.00),
+}
+
+
+def model_price(model_name: str) -> tuple[float, float]:
+    """Look up prices by the longest known prefix, so dated snapshots like "gpt-4o-2024-08-06" match."""
+    matches = [name for name in MODEL_PRICES if model_name.startswith(name)]
+    if not matches:
+        return 0.0, 0.0
+    return MODEL_PRICES[max(matches, key=len)]
+
+
+def cost_usd(model_name: str, input_tokens: int, output_tokens: int) -> float:
+    input_price, output_price = model_price(model_name)
+    return (input_tokens * input_price + output_tokens * output_price) / 1_000_000
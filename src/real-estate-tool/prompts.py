@@ -1,7 +1,8 @@
 from langchain_core.prompts import ChatPromptTemplate
 from models import State
+from tokens import count_tokens, take_within_budget, truncate_to_tokens
 
-translator_system_prompt = "You are responsible for translating, section by section, a property listing from English to Portuguese (Portugal)"
+translator_system_prompt = "You are responsible for translating a single section of a property listing from English to Portuguese (Portugal). Reply with the translated text only, preserving its formatting."
 title_generator_system_prompt = """
     You are responsible for generating a concise browser tab title for a real estate property listing.
     You will be given a draft title, from which you will extract the property type (e.g. 'apartment', 'house', or simply 'property').
@@ -46,20 +47,134 @@ Requirements:
 
 neighborhood_summary_generator_system_prompt = "You are responsible for generating a single-paragraph, concise summary of the given neighborhood, to be included in a property listing. Focus on lifestyle and area information."
 
-
-def generate_full_description_user_prompt(state: State) -> str:
+single_shot_system_prompt = f"""You are a real estate listing writer. From the structured property details given by the user, write every section of the listing in one pass, following the field descriptions of the requested schema.
+Work through the sections in order: adjectives first, then the title, the neighborhood summary, the full description, the headline and finally the meta-description, reusing what you wrote earlier.
+Guidelines per section:
+- Adjectives: {adjective_generator_system_prompt}
+- Title: {title_generator_system_prompt}
+- Neighborhood summary: {neighborhood_summary_generator_system_prompt}
+- Full description: {full_description_system_prompt}
+- Headline: {headline_system_prompt}
+- Meta-description: {meta_description_system_prompt}"""
+
+
+# Templates are built once at import and only formatted per request. User-provided text is
+# always passed in as a variable so that braces in it are never parsed as placeholders.
+translator_prompt_template = ChatPromptTemplate(
+    [
+        ("system", translator_system_prompt),
+        ("user", "{text}"),
+    ]
+)
+
+title_generator_prompt_template = ChatPromptTemplate(
+    [
+        ("system", title_generator_system_prompt),
+        ("human", title_generator_user_prompt),
+    ]
+)
+
+adjective_generator_prompt_template = ChatPromptTemplate(
+    [
+        ("system", adjective_generator_system_prompt),
+        ("human", "{features}"),
+    ]
+)
+
+full_description_prompt_template = ChatPromptTemplate(
+    [
+        ("system", full_description_system_prompt),
+        ("human", "{description_input}"),
+    ]
+)
+
+neighborhood_summary_prompt_template = ChatPromptTemplate(
+    [
+        ("system", neighborhood_summary_generator_system_prompt),
+        ("human", "{neighborhood}"),
+    ]
+)
+
+headline_prompt_template = ChatPromptTemplate(
+    [
+        ("system", headline_system_prompt),
+        ("human", headline_user_prompt),
+    ]
+)
+
+single_shot_prompt_template = ChatPromptTemplate(
+    [
+        ("system", single_shot_system_prompt),
+        ("human", "{features}"),
+    ]
+)
+
+meta_description_prompt_template = ChatPromptTemplate(
+    [
+        ("system", meta_description_system_prompt),
+        ("human", "{description_input}"),
+    ]
+)
+
+
+# Token budgets for the user message of each node. The property details are always sent in
+# full; adjectives and reference text (the neighborhood summary, the full description) are
+# cut to fit in what is left, but never below the minimums, so that long property details
+# make the prompt longer instead of leaving them out.
+PROMPT_TOKEN_BUDGETS = {
+    "generate_full_description": 280,
+    "generate_meta_description": 160,
+    "generate_headline": 40,
+}
+# Share of what is left of the full description budget that adjectives may use; the
+# neighborhood summary gets the rest.
+ADJECTIVES_BUDGET_SHARE = 0.35
+MIN_ADJECTIVES_TOKENS = 30
+MIN_REFERENCE_TOKENS = 60
+
+
+def full_description_user_prompt(state: State) -> str:
     user_input = state["user_input"]
-    property_features = user_input.property_features
     user_prompt = user_input.build_features_paragraph()
+    remaining = PROMPT_TOKEN_BUDGETS["generate_full_description"] - count_tokens(user_prompt)
 
-    adjectives_list = state["adjectives"].all_adjectives_list
+    adjectives_list = take_within_budget(
+        state["adjectives"].compact_list(),
+        max(int(remaining * ADJECTIVES_BUDGET_SHARE), MIN_ADJECTIVES_TOKENS),
+    )
     if adjectives_list:
-        user_prompt += "Here's a list of adjectives/phrases you can use to populate your description:\n- "
-        user_prompt += "\n- ".join(adjectives_list)
+        adjectives = "Here's a list of adjectives/phrases you can use to populate your description:\n- "
+        adjectives += "\n- ".join(adjectives_list)
+        user_prompt += adjectives
+        remaining -= count_tokens(adjectives)
+
+    summary_intro = "\nAnd here is a summary for the neighborhood: "
+    neighborhood_summary = truncate_to_tokens(
+        state["neighborhood_summary"],
+        max(remaining - count_tokens(summary_intro), MIN_REFERENCE_TOKENS),
+    )
+    return user_prompt + summary_intro + neighborhood_summary
+
 
-    neighborhood_summary = state["neighborhood_summary"]
-    user_prompt += (
-        f"\nAnd here is a summary for the neighborhood: {neighborhood_summary}"
+def meta_description_user_prompt(state: State) -> str:
+    """The keywords the meta description should include, followed by as much of the full
+    description as the budget allows.
+    """
+    user_input = state["user_input"]
+    location_details = user_input.location_details
+    user_prompt = (
+        f"{user_input.title}, for {user_input.listing_type} in "
+        f"{location_details.neighborhood}, {location_details.city}.\n"
+        "Description: "
+    )
+    remaining = PROMPT_TOKEN_BUDGETS["generate_meta_description"] - count_tokens(user_prompt)
+    return user_prompt + truncate_to_tokens(
+        state["full_description"], max(remaining, MIN_REFERENCE_TOKENS)
     )
 
-    return user_prompt
+
+def headline_features(state: State) -> str:
+    features = take_within_budget(
+        state["adjectives"].compact_list(), PROMPT_TOKEN_BUDGETS["generate_headline"], "; "
+    )
+    return "; ".join(features)
@@ -0,0 +1,88 @@
+import asyncio
+import os
+import time
+import weakref
+
+from dotenv import load_dotenv
+
+
+class RateLimiter:
+    """Async token bucket allowing `per_minute` units (requests or tokens) with bursts of up to
+    one second's worth.
+    """
+
+    def __init__(self, per_minute: float):
+        self.rate = per_minute / 60
+        self.capacity = max(1.0, self.rate)
+        self._tokens = self.capacity
+        self._updated_at = time.monotonic()
+        # asyncio locks belong to one event loop; the bucket itself is shared.
+        self._locks: weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Lock] = (
+            weakref.WeakKeyDictionary()
+        )
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+
+    async def acquire(self, amount: float = 1.0):
+        # Amounts larger than a full bucket wait for a full bucket and leave it in debt.
+        needed = min(amount, self.capacity)
+        loop = asyncio.get_running_loop()
+        if (lock := self._locks.get(loop)) is None:
+            lock = self._locks[loop] = asyncio.Lock()
+        async with lock:
+            self._refill()
+            while self._tokens < needed:
+                await asyncio.sleep((needed - self._tokens) / self.rate)
+                self._refill()
+            self._tokens -= amount
+
+    def consume(self, amount: float):
+        """Take (or, if negative, give back) `amount` without waiting."""
+        self._refill()
+        self._tokens = min(self.capacity, self._tokens - amount)
+
+
+model_rate_limiters: dict[str, RateLimiter] = {}
+model_token_limiters: dict[str, RateLimiter] = {}
+
+
+def configure_rate_limits(
+    requests_per_minute: dict[str, float], tokens_per_minute: dict[str, float] | None = None
+):
+    for model_name, limit in requests_per_minute.items():
+        model_rate_limiters[model_name] = RateLimiter(limit)
+    for model_name, limit in (tokens_per_minute or {}).items():
+        model_token_limiters[model_name] = RateLimiter(limit)
+
+
+def parse_rate_limits(spec: str) -> dict[str, float]:
+    """Parse "gpt-4o=500,gpt-4o-mini=2000" into limits per minute by model."""
+    limits = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        model_name, limit = item.split("=")
+        limits[model_name.strip()] = float(limit)
+    return limits
+
+
+async def acquire(model_name: str, tokens: int = 0):
+    """Wait for a request slot and for `tokens` (the expected usage of the call)."""
+    if limiter := model_rate_limiters.get(model_name):
+        await limiter.acquire()
+    if tokens and (limiter := model_token_limiters.get(model_name)):
+        await limiter.acquire(tokens)
+
+
+def record_tokens(model_name: str, tokens: int):
+    """Correct a model's token budget once a call's actual usage is known."""
+    if limiter := model_token_limiters.get(model_name):
+        limiter.consume(tokens)
+
+
+load_dotenv()
+configure_rate_limits(
+    parse_rate_limits(os.getenv("LLM_RATE_LIMITS", "")),
+    parse_rate_limits(os.getenv("LLM_TOKEN_LIMITS", "")),
+)
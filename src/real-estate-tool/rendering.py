@@ -0,0 +1,200 @@
+"""Renders generated listings as an HTML fragment, a full HTML page or schema.org JSON-LD.
+
+Templates are module-level format strings and the JSON encoder is built once; every value
+from the user or an LLM is escaped before it is substituted.
+"""
+
+from __future__ import annotations
+
+import json
+from html import escape
+from typing import TYPE_CHECKING, Literal, TextIO
+
+from listing_templates import extract_property_type
+
+if TYPE_CHECKING:
+    from models import OutputState, UserInput
+
+RenderTarget = Literal["fragment", "page", "json_ld"]
+
+FRAGMENT_TEMPLATE = """<article class="listing">
+  <h1>{headline}</h1>
+  <section id="description">
+    <p>{full_description}</p>
+  </section>
+  <ul id="key-features">
+{key_features}
+  </ul>
+  <section id="neighborhood">
+    <p>{neighborhood_summary}</p>
+  </section>
+  <p class="call-to-action">{call_to_action}</p>
+</article>
+"""
+KEY_FEATURE_TEMPLATE = "    <li>{}</li>"
+
+PAGE_HEAD_TEMPLATE = """<!DOCTYPE html>
+<html lang="{language}">
+<head>
+  <meta charset="utf-8">
+  <title>{title}</title>
+{head}</head>
+<body>
+"""
+META_DESCRIPTION_TEMPLATE = '  <meta name="description" content="{}">\n'
+PAGE_FOOT = "</body>\n</html>\n"
+JSON_LD_TEMPLATE = '  <script type="application/ld+json">{}</script>\n'
+
+# schema.org types for the property types listing_templates recognises.
+SCHEMA_TYPES = {
+    "apartment": "Apartment",
+    "studio": "Apartment",
+    "penthouse": "Apartment",
+    "loft": "Apartment",
+    "duplex": "Apartment",
+    "house": "SingleFamilyResidence",
+    "villa": "SingleFamilyResidence",
+}
+BUSINESS_FUNCTIONS = {
+    "sale": "http://purl.org/goodrelations/v1#Sell",
+    "rent": "http://purl.org/goodrelations/v1#LeaseOut",
+}
+
+
+_json_encoder = json.JSONEncoder(ensure_ascii=False)
+
+
+def escape_text(text: str) -> str:
+    """Escape element content. Most generated text has nothing to escape, so that is checked
+    first; quotes only need escaping inside attributes.
+    """
+    if "&" in text or "<" in text or ">" in text:
+        return text.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+    return text
+
+
+def render_fragment(listing: OutputState) -> str:
+    """The listing body, for embedding in an existing page."""
+    return FRAGMENT_TEMPLATE.format(
+        headline=escape_text(listing.headline),
+        full_description=escape_text(listing.full_description),
+        key_features="\n".join(
+            KEY_FEATURE_TEMPLATE.format(escape_text(feature))
+            for feature in listing.key_features_list
+        ),
+        neighborhood_summary=escape_text(listing.neighborhood_summary),
+        call_to_action=escape_text(listing.call_to_action),
+    )
+
+
+def json_ld(listing: OutputState, user_input: UserInput | None = None) -> dict:
+    """A schema.org RealEstateListing; property details and the offer need `user_input`."""
+    document = {
+        "@context": "https://schema.org",
+        "@type": "RealEstateListing",
+        "name": listing.title,
+        "headline": listing.headline,
+        "description": listing.meta_description,
+    }
+    if user_input is None:
+        return document
+
+    features = user_input.property_features
+    location_details = user_input.location_details
+    accommodation = {
+        "@type": SCHEMA_TYPES.get(extract_property_type(user_input.title), "Accommodation"),
+        "address": {
+            "@type": "PostalAddress",
+            "addressLocality": location_details.city,
+            "addressRegion": location_details.neighborhood,
+        },
+        "numberOfBedrooms": features.bedrooms,
+        "numberOfBathroomsTotal": features.bathrooms,
+        "floorLevel": features.floor,
+        "yearBuilt": features.year_built,
+        "floorSize": (
+            {"@type": "QuantitativeValue", "value": features.area_sqm, "unitCode": "MTK"}
+            if features.area_sqm
+            else None
+        ),
+        "amenityFeature": [
+            {"@type": "LocationFeatureSpecification", "name": amenity, "value": True}
+            for amenity in ("balcony", "parking", "elevator")
+            if getattr(features, amenity)
+        ],
+    }
+    document["inLanguage"] = user_input.language
+    document["mainEntity"] = {key: value for key, value in accommodation.items() if value}
+    document["offers"] = {
+        "@type": "Offer",
+        "price": user_input.price,
+        "priceCurrency": "EUR",
+        "businessFunction": BUSINESS_FUNCTIONS[user_input.listing_type],
+    }
+    return document
+
+
+def render_json_ld(listing: OutputState, user_input: UserInput | None = None) -> str:
+    return _json_encoder.encode(json_ld(listing, user_input))
+
+
+def _json_ld_script(listing: OutputState, user_input: UserInput | None) -> str:
+    # Inside <script> nothing is unescaped, so "<" is encoded to keep "</script>" in a
+    # description from closing the block.
+    return JSON_LD_TEMPLATE.format(render_json_ld(listing, user_input).replace("<", "\\u003c"))
+
+
+def render_page(listing: OutputState, user_input: UserInput | None = None) -> str:
+    """A complete HTML document with the title, meta description and JSON-LD in the head."""
+    return (
+        PAGE_HEAD_TEMPLATE.format(
+            language=escape(user_input.language if user_input else "en"),
+            title=escape_text(listing.title),
+            head=(
+                META_DESCRIPTION_TEMPLATE.format(escape(listing.meta_description))
+                + _json_ld_script(listing, user_input)
+            ),
+        )
+        + render_fragment(listing)
+        + PAGE_FOOT
+    )
+
+
+def render(listing: OutputState, target: RenderTarget, user_input: UserInput | None = None) -> str:
+    if target == "fragment":
+        return render_fragment(listing)
+    if target == "json_ld":
+        return render_json_ld(listing, user_input)
+    return render_page(listing, user_input)
+
+
+class StreamingWriter:
+    """Writes listings one at a time into a single document, so a batch of any size is never
+    held in memory: an HTML page with one article per listing ("page"), concatenated
+    fragments ("fragment") or a JSON array of JSON-LD objects ("json_ld").
+    """
+
+    def __init__(self, file: TextIO, target: RenderTarget = "page", title: str = "Listings"):
+        self.file = file
+        self.target = target
+        self.count = 0
+        if target == "page":
+            file.write(PAGE_HEAD_TEMPLATE.format(language="en", title=escape_text(title), head=""))
+        elif target == "json_ld":
+            file.write("[\n")
+
+    def write(self, listing: OutputState, user_input: UserInput | None = None):
+        if self.target == "json_ld":
+            separator = ",\n" if self.count else ""
+            self.file.write(separator + render_json_ld(listing, user_input))
+        else:
+            if self.target == "page":
+                self.file.write(_json_ld_script(listing, user_input))
+            self.file.write(render_fragment(listing))
+        self.count += 1
+
+    def close(self):
+        if self.target == "page":
+            self.file.write(PAGE_FOOT)
+        elif self.target == "json_ld":
+            self.file.write("\n]\n")
@@ -0,0 +1,95 @@
+from __future__ import annotations
+
+import math
+import os
+import threading
+import tomllib
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Container, Iterator
+
+from dotenv import load_dotenv
+
+
+@dataclass(frozen=True)
+class Tier:
+    """Expected latency (seconds) and cost (USD) of one call on a model tier, at no load."""
+
+    latency: float
+    cost: float = 0.0
+
+
+@dataclass(frozen=True)
+class NodeBudget:
+    """Tiers a node may run on, best quality first, and the budget each call has to fit in."""
+
+    tiers: list[str]
+    max_latency: float = math.inf
+    max_cost: float = math.inf
+
+
+@dataclass
+class ModelRouter:
+    """Picks a model tier per node from its budget and the number of listings in flight.
+
+    A tier's expected latency grows by `load_factor` for every other listing in flight, so
+    under peak load nodes fall back to faster, cheaper tiers until they fit their budget.
+    """
+
+    tiers: dict[str, Tier]
+    nodes: dict[str, NodeBudget]
+    load_factor: float = 0.0
+    queue_depth: int = 0
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    @classmethod
+    def from_file(cls, path: str | Path) -> ModelRouter:
+        with open(path, "rb") as file:
+            config = tomllib.load(file)
+        return cls(
+            tiers={name: Tier(**tier) for name, tier in config.get("tiers", {}).items()},
+            nodes={name: NodeBudget(**node) for name, node in config.get("nodes", {}).items()},
+            load_factor=config.get("load_factor", 0.0),
+        )
+
+    def expected_latency(self, tier: str) -> float:
+        return self.tiers[tier].latency * (1 + self.load_factor * max(0, self.queue_depth - 1))
+
+    def fits(self, tier: str, budget: NodeBudget) -> bool:
+        return (
+            self.expected_latency(tier) <= budget.max_latency
+            and self.tiers[tier].cost <= budget.max_cost
+        )
+
+    def choose(self, node: str, available: Container[str], default: str) -> str:
+        """Return the first of the node's tiers that is available and fits its budget,
+        falling back to the last available one, or `default` for nodes without a budget.
+        """
+        budget = self.nodes.get(node)
+        candidates = [tier for tier in budget.tiers if tier in available] if budget else []
+        if not candidates:
+            return default
+        for tier in candidates:
+            if self.fits(tier, budget):
+                return tier
+        return candidates[-1]
+
+    @contextmanager
+    def track_listing(self) -> Iterator[None]:
+        """Count a listing as in flight for the duration of the block."""
+        with self._lock:
+            self.queue_depth += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.queue_depth -= 1
+
+
+load_dotenv()
+DEFAULT_CONFIG_PATH = os.getenv(
+    "MODEL_ROUTING_CONFIG", str(Path(__file__).with_name("routing.toml"))
+)
+
+router = ModelRouter.from_file(DEFAULT_CONFIG_PATH)
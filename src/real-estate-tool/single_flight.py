@@ -0,0 +1,50 @@
+import asyncio
+from typing import Awaitable, Callable, Hashable, TypeVar
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    """Coalesces concurrent calls with the same key into one execution whose result (or
+    exception) is shared by every caller. Keys are only held while the call is in flight.
+    """
+
+    def __init__(self):
+        self._calls: dict[tuple[asyncio.AbstractEventLoop, Hashable], asyncio.Future] = {}
+        self._waiters: dict[asyncio.Future, int] = {}
+
+    def in_flight(self) -> int:
+        return len(self._calls)
+
+    async def do(self, key: Hashable, function: Callable[[], Awaitable[T]]) -> tuple[T, bool]:
+        """Run `function()` unless a call with `key` is already in flight, then await it.
+
+        Returns `(result, shared)`, where `shared` is True for callers that joined an existing
+        call. The call is shielded, so a cancelled caller does not cancel it for the others;
+        it is only cancelled once every caller waiting for it has been.
+        """
+        # Tasks belong to one event loop, so calls are only shared within the same loop.
+        flight_key = (asyncio.get_running_loop(), key)
+        call = self._calls.get(flight_key)
+        shared = call is not None
+        if not shared:
+            call = asyncio.ensure_future(function())
+            self._calls[flight_key] = call
+
+            def forget(_):
+                if self._calls.get(flight_key) is call:
+                    del self._calls[flight_key]
+
+            call.add_done_callback(forget)
+
+        self._waiters[call] = self._waiters.get(call, 0) + 1
+        try:
+            return await asyncio.shield(call), shared
+        except asyncio.CancelledError:
+            if self._waiters[call] == 1:
+                call.cancel()
+            raise
+        finally:
+            self._waiters[call] -= 1
+            if not self._waiters[call]:
+                del self._waiters[call]
@@ -0,0 +1,83 @@
+"""Token counting for prompt budgets and rate-limit reservations."""
+
+import logging
+import os
+import re
+import threading
+from typing import Iterable
+
+import tiktoken
+from dotenv import load_dotenv
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+TOKENIZER_MODEL = "gpt-4o"
+TOKENIZER_LOAD_TIMEOUT = float(os.getenv("TOKENIZER_LOAD_TIMEOUT", "10"))
+_SENTENCE_END = re.compile(r"[.!?](?=\s)")
+
+
+def _load_encoding() -> tiktoken.Encoding | None:
+    # tiktoken downloads the encoding on first use (cached in TIKTOKEN_CACHE_DIR) and without
+    # a timeout, so it is loaded in a daemon thread that is only waited on for
+    # TOKENIZER_LOAD_TIMEOUT seconds; without it, token counts are estimated.
+    loaded = {}
+
+    def load():
+        try:
+            loaded["encoding"] = tiktoken.encoding_for_model(TOKENIZER_MODEL)
+        except Exception as error:
+            loaded["error"] = error
+
+    thread = threading.Thread(target=load, name="tokenizer-load", daemon=True)
+    thread.start()
+    thread.join(TOKENIZER_LOAD_TIMEOUT)
+    if "encoding" in loaded:
+        return loaded["encoding"]
+    error = loaded.get("error", f"not loaded within {TOKENIZER_LOAD_TIMEOUT:g}s")
+    logger.warning("Tokenizer unavailable, estimating 4 characters per token: %r", error)
+    return None
+
+
+# Loaded at import, so that the download never blocks a running event loop.
+_ENCODING = _load_encoding()
+
+
+def count_tokens(text: str) -> int:
+    if _ENCODING is None:
+        return (len(text) + 3) // 4
+    return len(_ENCODING.encode(text, disallowed_special=()))
+
+
+def truncate_to_tokens(text: str, budget: int) -> str:
+    """Cut `text` to at most `budget` tokens, after the last whole sentence that fits, or at
+    a word boundary if not even the first sentence does.
+    """
+    if count_tokens(text) <= budget:
+        return text
+    if budget <= 0:
+        return ""
+    if _ENCODING is None:
+        head = text[: budget * 4]
+    else:
+        head = _ENCODING.decode(_ENCODING.encode(text, disallowed_special=())[:budget])
+    # The lookahead needs the character after the cut, so the sentence end is searched in
+    # `head` followed by that character.
+    sentence_ends = list(_SENTENCE_END.finditer(text[: len(head) + 1]))
+    if sentence_ends:
+        return head[: sentence_ends[-1].end()]
+    return head.rsplit(" ", 1)[0] if " " in head else head
+
+
+def take_within_budget(items: Iterable[str], budget: int, separator: str = "\n- ") -> list[str]:
+    """The leading `items` whose joined length stays within `budget` tokens."""
+    taken = []
+    used = 0
+    separator_tokens = count_tokens(separator)
+    for item in items:
+        cost = count_tokens(item) + (separator_tokens if taken else 0)
+        if used + cost > budget:
+            break
+        taken.append(item)
+        used += cost
+    return taken
@@ -1,6 +1,37 @@
+import json
+
 import requests
 import streamlit as st
 
+SECTION_LABELS = {
+    "title": "Title",
+    "headline": "Headline",
+    "meta_description": "Meta Description",
+    "full_description": "Description",
+    "key_features_list": "Key Features",
+    "neighborhood_summary": "Neighborhood",
+    "call_to_action": "Call to Action",
+}
+
+
+def iter_sse_events(response):
+    event, data = "message", []
+    for line in response.iter_lines(decode_unicode=True):
+        if line.startswith("event:"):
+            event = line.removeprefix("event:").strip()
+        elif line.startswith("data:"):
+            data.append(line.removeprefix("data:").strip())
+        elif not line and data:
+            yield event, json.loads("\n".join(data))
+            event, data = "message", []
+
+
+def render_section(placeholder, section, content):
+    if isinstance(content, list):
+        content = "\n".join(f"- {item}" for item in content)
+    placeholder.markdown(f"**{SECTION_LABELS[section]}**\n\n{content}")
+
+
 # -----------------------------
 # Streamlit UI
 # -----------------------------
@@ -58,16 +89,31 @@ if submitted:
     }
 
     try:
-        # Call your backend endpoint
-        # Replace with your actual endpoint URL
-        endpoint_url = "http://localhost:8000/generate_property_listing"
-        response = requests.post(endpoint_url, json=data)
-
-        if response.status_code == 200:
-            html_content = response.text
-            st.subheader("Generated HTML")
-            st.code(html_content, language="html")
-        else:
-            st.error(f"Request failed with status {response.status_code}")
+        # Sections are rendered as soon as the backend produces them; the description and
+        # neighborhood summary are filled in token by token.
+        endpoint_url = "http://localhost:8000/generate_property_listing/stream"
+        placeholders = {section: st.empty() for section in SECTION_LABELS}
+        drafts = {section: "" for section in SECTION_LABELS}
+
+        with requests.post(endpoint_url, json=data, stream=True) as response:
+            if response.status_code != 200:
+                st.error(f"Request failed with status {response.status_code}")
+            else:
+                for event, payload in iter_sse_events(response):
+                    if event == "token":
+                        section = payload["section"]
+                        drafts[section] += payload["delta"]
+                        render_section(placeholders[section], section, drafts[section])
+                    elif event == "section":
+                        render_section(
+                            placeholders[payload["section"]],
+                            payload["section"],
+                            payload["content"],
+                        )
+                    elif event == "done":
+                        st.subheader("Generated HTML")
+                        st.code(payload["html"], language="html")
+                    elif event == "error":
+                        st.error(f"Generation failed: {payload['error']}")
     except Exception as e:
         st.error(f"Error calling endpoint: {e}")